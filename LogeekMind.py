@@ -4,6 +4,7 @@ import streamlit.components.v1 as components
 import auth_manager as auth
 from auth_manager import sign_out_user
 from streamlit_cookies_controller import CookieController
+from utils import start_transcription_prewarm
 
 st.set_page_config(
     page_title="LogeekMind: Your AI Academic Assistant",
@@ -12,6 +13,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Loads the Whisper workers in the background so the audio page is ready before anyone opens it.
+start_transcription_prewarm()
+
 
 
 css = """
@@ -0,0 +1,79 @@
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import transcription_manager as tm
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+DEFAULT_REFERENCE = os.path.join(SAMPLES_DIR, "lecture_sample.txt")
+DEFAULT_AUDIO = os.path.join(SAMPLES_DIR, "lecture_sample.mp3")
+
+
+def normalize_words(text):
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def ensure_sample_audio(audio_path, reference_text):
+    # The clip is synthesised from the reference text on first run instead of being committed.
+    if os.path.exists(audio_path):
+        return
+    from gtts import gTTS
+
+    print(f"Synthesising sample clip to {audio_path} ...")
+    gTTS(text=reference_text, lang="en").save(audio_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ASR engines by real-time factor and word error rate.")
+    parser.add_argument("--engines", nargs="+", default=list(tm.ENGINES), choices=list(tm.ENGINES))
+    parser.add_argument("--sizes", nargs="+", default=tm.MODEL_SIZES, choices=tm.MODEL_SIZES)
+    parser.add_argument("--audio", default=DEFAULT_AUDIO)
+    parser.add_argument("--reference", default=DEFAULT_REFERENCE)
+    parser.add_argument("--threads", type=int, default=0, help="CPU threads per engine (0 = library default)")
+    args = parser.parse_args()
+
+    with open(args.reference, encoding="utf-8") as f:
+        reference_text = f.read()
+    if args.audio == DEFAULT_AUDIO:
+        ensure_sample_audio(args.audio, reference_text)
+
+    audio = tm.decode_audio_file(args.audio)
+    duration = len(audio) / tm.SAMPLE_RATE
+    print(f"Clip: {args.audio} ({duration:.1f}s)\n")
+    print(f"{'engine':<34}{'load (s)':>10}{'transcribe (s)':>16}{'RTF':>8}{'WER':>8}")
+
+    for engine_name in args.engines:
+        for model_size in args.sizes:
+            start = time.perf_counter()
+            try:
+                engine = tm.load_engine(engine_name, model_size, args.threads)
+            except RuntimeError as e:
+                print(f"{engine_name + ':' + model_size:<34}skipped: {e}")
+                continue
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            result = engine.transcribe(audio)
+            transcribe_seconds = time.perf_counter() - start
+
+            print(f"{engine.engine_id:<34}{load_seconds:>10.2f}{transcribe_seconds:>16.2f}"
+                  f"{transcribe_seconds / duration:>8.3f}{word_error_rate(reference_text, result['text']):>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
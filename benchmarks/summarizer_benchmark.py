@@ -0,0 +1,87 @@
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nltk
+from sumy.nlp.tokenizers import Tokenizer
+from sumy.parsers.plaintext import PlaintextParser
+
+import summarizer_manager as sm
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+DEFAULT_CORPUS = os.path.join(SAMPLES_DIR, "lecture_sample.txt")
+
+
+def synthetic_document(corpus_text, sentence_count, seed=0):
+    # Sentences are drawn from the sample lecture's vocabulary with realistic lengths, so word overlap
+    # (and with it the density of the similarity graph) resembles real notes at any size.
+    rng = random.Random(seed)
+    words = re.findall(r"[A-Za-z']+", corpus_text)
+    sentences = []
+    for _ in range(sentence_count):
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 30)))
+        sentences.append(sentence[0].upper() + sentence[1:] + ".")
+    # A paragraph break every ten sentences, as in typical notes.
+    return "\n\n".join(" ".join(sentences[start:start + 10]) for start in range(0, sentence_count, 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare TextRank engines on documents of increasing length.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000, 50000], help="sentences per document")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--sumy-max-sentences", type=int, default=2000,
+                        help="larger documents only get an estimate for sumy, extrapolated quadratically")
+    args = parser.parse_args()
+
+    for resource in ("punkt", "punkt_tab"):
+        try:
+            nltk.data.find(f"tokenizers/{resource}")
+        except LookupError:
+            nltk.download(resource)
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus_text = f.read()
+
+    print(f"{'sentences':>10}{'parse (s)':>12}{'sumy (s)':>12}{'numpy (s)':>12}{'speed-up':>10}{'same summary':>14}")
+    sumy_reference = None
+
+    for size in args.sizes:
+        start = time.perf_counter()
+        document = PlaintextParser.from_string(synthetic_document(corpus_text, size), Tokenizer("english")).document
+        parse_seconds = time.perf_counter() - start
+        sentence_count = len(document.sentences)
+        summary_length = max(10, int(sentence_count * 0.12))
+
+        start = time.perf_counter()
+        numpy_summary = sm.load_summarizer("numpy")(document, summary_length)
+        numpy_seconds = time.perf_counter() - start
+
+        if sentence_count <= args.sumy_max_sentences:
+            start = time.perf_counter()
+            sumy_summary = sm.load_summarizer("sumy")(document, summary_length)
+            sumy_seconds = time.perf_counter() - start
+            sumy_reference = (sentence_count, sumy_seconds)
+            sumy_column = f"{sumy_seconds:.2f}"
+            same = "yes" if sumy_summary == numpy_summary else "no"
+        elif sumy_reference is not None:
+            sumy_seconds = sumy_reference[1] * (sentence_count / sumy_reference[0]) ** 2
+            sumy_column = f"~{sumy_seconds:.0f}"
+            same = "n/a"
+        else:
+            sumy_seconds = None
+            sumy_column = "skipped"
+            same = "n/a"
+
+        speed_up = f"{sumy_seconds / numpy_seconds:.0f}x" if sumy_seconds else "-"
+        print(f"{sentence_count:>10}{parse_seconds:>12.2f}{sumy_column:>12}{numpy_seconds:>12.2f}{speed_up:>10}{same:>14}")
+
+    print("\n~ marks sumy times extrapolated from the largest document it was run on.")
+
+
+if __name__ == "__main__":
+    main()
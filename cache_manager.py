@@ -0,0 +1,544 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from google.genai import types
+from google.genai.errors import APIError
+
+from conversation_manager import estimate_tokens
+
+
+class ResponseCache:
+
+    def __init__(self, max_entries=512, ttl_seconds=6 * 60 * 60, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses "
+                    "(key TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.disk_path, timeout=5)
+
+    def _is_fresh(self, created_at):
+        return self.ttl_seconds is None or time.time() - created_at < self.ttl_seconds
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if self._is_fresh(created_at):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return response
+                del self._entries[key]
+
+        if self.disk_path:
+            response = self._disk_get(key)
+            if response is not None:
+                with self._lock:
+                    self._stats["disk_hits"] += 1
+                self._memory_put(key, response)
+                return response
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key, response):
+        self._memory_put(key, response)
+        if self.disk_path:
+            self._disk_put(key, response)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.disk_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            except sqlite3.Error:
+                pass
+
+    def record_bypass(self):
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def _memory_put(self, key, response):
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def _disk_get(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                payload, created_at = row
+                if not self._is_fresh(created_at):
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    return None
+            return types.GenerateContentResponse.model_validate_json(payload)
+        except (sqlite3.Error, ValueError):
+            return None
+
+    def _disk_put(self, key, response):
+        try:
+            payload = response.model_dump_json(exclude_none=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, payload, created_at) VALUES (?, ?, ?)",
+                    (key, payload, time.time()),
+                )
+                if self.ttl_seconds is not None:
+                    conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        except (sqlite3.Error, ValueError):
+            pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.disk_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM responses")
+            except sqlite3.Error:
+                pass
+
+
+def _normalize_text(text):
+    return " ".join(text.split())
+
+
+def _normalize(value):
+    # Returns a JSON-serialisable form of a request argument, or raises TypeError
+    # for inputs (e.g. images) that cannot be keyed reliably.
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return _normalize_text(value)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    if hasattr(value, "model_dump"):
+        return _normalize(value.model_dump(mode="json", exclude_none=True))
+    raise TypeError(f"Cannot build a cache key for {type(value).__name__}")
+
+
+def make_cache_key(model, contents, config=None):
+    if getattr(config, "http_options", None) is not None:
+        # Transport settings such as per-request timeouts do not change what Gemini generates.
+        config = config.model_copy(update={"http_options": None})
+
+    try:
+        payload = json.dumps(
+            {"model": model, "contents": _normalize(contents), "config": _normalize(config) or None},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+    except (TypeError, ValueError):
+        return None
+
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _CachedModels:
+
+    def __init__(self, models, cache):
+        self._models = models
+        self._cache = cache
+
+    def generate_content(self, *, model, contents, config=None, **kwargs):
+        key = None if kwargs else make_cache_key(model, contents, config)
+
+        if key is None:
+            self._cache.record_bypass()
+            return self._models.generate_content(model=model, contents=contents, config=config, **kwargs)
+
+        response = self._cache.get(key)
+        if response is not None:
+            return response
+
+        response = self._models.generate_content(model=model, contents=contents, config=config)
+
+        # Blocked or empty generations are not worth replaying to the next student.
+        if getattr(response, "text", None):
+            self._cache.put(key, response)
+        return response
+
+    def discard(self, *, model, contents, config=None):
+        # Lets callers drop a response they could not use (e.g. malformed JSON)
+        # so a retry goes back to Gemini instead of replaying it.
+        key = make_cache_key(model, contents, config)
+        if key is not None:
+            self._cache.discard(key)
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class CachedGeminiClient:
+
+    def __init__(self, client, cache, key_id=None):
+        self._client = client
+        self.cache = cache
+        self.key_id = key_id
+        self.models = _CachedModels(client.models, cache)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+class KeyValidationCache:
+
+    def __init__(self, valid_ttl_seconds=60 * 60, invalid_ttl_seconds=10 * 60, max_entries=1024):
+        self.valid_ttl_seconds = valid_ttl_seconds
+        self.invalid_ttl_seconds = invalid_ttl_seconds
+        self.max_entries = max_entries
+
+        # Keys are never stored, only an HMAC under a per-process salt.
+        self._salt = secrets.token_bytes(16)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fingerprint(self, api_key):
+        return hmac.new(self._salt, api_key.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def get(self, api_key):
+        fingerprint = self._fingerprint(api_key)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            is_valid, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[fingerprint]
+                return None
+            self._entries.move_to_end(fingerprint)
+            return is_valid
+
+    def put(self, api_key, is_valid):
+        ttl = self.valid_ttl_seconds if is_valid else self.invalid_ttl_seconds
+        fingerprint = self._fingerprint(api_key)
+        with self._lock:
+            self._entries[fingerprint] = (is_valid, time.time() + ttl)
+            self._entries.move_to_end(fingerprint)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class ClientPool:
+
+    def __init__(self, factory, max_clients=64):
+        self.factory = factory
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key_id, api_key):
+        with self._lock:
+            client = self._clients.get(key_id)
+            if client is not None:
+                self._clients.move_to_end(key_id)
+                return client
+
+        # Built outside the lock so a slow client construction does not stall other sessions.
+        client = self.factory(api_key)
+
+        with self._lock:
+            client = self._clients.setdefault(key_id, client)
+            self._clients.move_to_end(key_id)
+            while len(self._clients) > self.max_clients:
+                # Evicted clients are left to the garbage collector rather than closed,
+                # since a session may still be mid-request with one.
+                self._clients.popitem(last=False)
+            return client
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+
+# Smallest prompt Gemini will cache explicitly, per model; anything shorter is rejected by caches.create.
+MIN_CACHE_TOKENS = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-flash-lite": 1024,
+    "gemini-2.5-pro": 4096,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+
+
+class ContextCacheManager:
+
+    def __init__(self, ttl_seconds=60 * 60, refresh_margin_seconds=5 * 60, retry_after_seconds=10 * 60):
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.retry_after_seconds = retry_after_seconds
+
+        # (key_id, model, instruction hash) -> (cached content name or None, valid until)
+        self._handles = {}
+        # (key_id, model, instruction hash) -> lock held while that handle is being created or refreshed
+        self._handle_locks = {}
+        self._lock = threading.Lock()
+
+    def _handle_key(self, key_id, model, system_instruction):
+        return key_id, model, hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()
+
+    def _expires_at(self, cached_content):
+        if cached_content.expire_time is not None:
+            return cached_content.expire_time.timestamp()
+        return time.time() + self.ttl_seconds
+
+    def _create(self, client, model, system_instruction):
+        cached_content = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name="logeekmind-system-instruction",
+                system_instruction=system_instruction,
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        return cached_content.name, self._expires_at(cached_content)
+
+    def _extend(self, client, name):
+        # Pushes the expiry of an existing cache forward; cheaper than creating (and paying for) another one.
+        cached_content = client.caches.update(
+            name=name,
+            config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+        )
+        return name, self._expires_at(cached_content)
+
+    def _usable(self, entry, now):
+        if entry is None:
+            return False
+        name, valid_until = entry
+        if name is None:
+            return now < valid_until
+        return now < valid_until - self.refresh_margin_seconds
+
+    def cached_content_name(self, client, key_id, model, system_instruction):
+        # Too short to be cached at all: don't spend a create call on every retry window finding that out.
+        if estimate_tokens(system_instruction) < MIN_CACHE_TOKENS.get(model, DEFAULT_MIN_CACHE_TOKENS):
+            return None
+
+        handle_key = self._handle_key(key_id, model, system_instruction)
+
+        with self._lock:
+            entry = self._handles.get(handle_key)
+            handle_lock = self._handle_locks.setdefault(handle_key, threading.Lock())
+        if self._usable(entry, time.time()):
+            return entry[0]
+
+        # Only one request per handle creates or refreshes it. Others keep using a cache that has not
+        # expired yet, or wait for the result rather than each creating a billed cache of their own.
+        if not handle_lock.acquire(blocking=False):
+            if entry is not None and entry[0] is not None and time.time() < entry[1]:
+                return entry[0]
+            handle_lock.acquire()
+
+        try:
+            now = time.time()
+            with self._lock:
+                entry = self._handles.get(handle_key)
+            if self._usable(entry, now):
+                return entry[0]
+
+            handle = None
+            if entry is not None and entry[0] is not None and now < entry[1]:
+                try:
+                    handle = self._extend(client, entry[0])
+                except Exception:
+                    # The cache may already be gone on the server; create a new one below.
+                    pass
+
+            if handle is None:
+                try:
+                    handle = self._create(client, model, system_instruction)
+                except Exception as e:
+                    # INVALID_ARGUMENT will not change for this instruction, so it stays inline for good. Anything
+                    # else (the tier does not allow caching, an outage) is retried after a while.
+                    permanent = isinstance(e, APIError) and e.code == 400
+                    handle = (None, float("inf") if permanent else now + self.retry_after_seconds)
+
+            with self._lock:
+                self._handles[handle_key] = handle
+            return handle[0]
+        finally:
+            handle_lock.release()
+
+    def config_for(self, client, key_id, model, system_instruction, **config_kwargs):
+        name = self.cached_content_name(client, key_id, model, system_instruction)
+        if name is None:
+            return types.GenerateContentConfig(system_instruction=system_instruction, **config_kwargs)
+        return types.GenerateContentConfig(cached_content=name, **config_kwargs)
+
+    def invalidate(self, key_id, model, system_instruction):
+        with self._lock:
+            self._handles.pop(self._handle_key(key_id, model, system_instruction), None)
+
+
+class BoundedStore:
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._total_bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+class DiskLRUStore:
+    # Byte values in one file per key under `directory`, evicted least-recently-used first once the
+    # directory grows past `max_bytes`. File mtimes carry the recency order across restarts.
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        existing = []
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                existing.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(existing):
+            self._entries[name] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._stats["evictions"] += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._path(key), "rb") as f:
+                value = f.read()
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            # Removed behind our back (another process sharing the directory, or a manual cleanup).
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["hits"] += 1
+        return value
+
+    def put(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(value)
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(value)
+            self._total_bytes += len(value)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._total_bytes
+
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,67 @@
+from google.genai import types
+
+# Rough characters-per-token ratio for English text; good enough for budgeting,
+# and avoids a count_tokens round trip on every turn.
+CHARS_PER_TOKEN = 4
+
+SUMMARY_PROMPT = """
+You are maintaining running notes of a tutoring session between a student and LogeekMind's AI Teacher.
+Update the notes below with the new part of the conversation. Keep the subject and level of the student,
+the topics already taught, key definitions, formulas and worked results, practice questions given and how
+the student answered, and anything the student said they struggle with. Drop greetings and repetition.
+Write compact bullet points, no more than 300 words in total.
+
+CURRENT NOTES:
+{summary}
+
+NEW CONVERSATION:
+{transcript}
+"""
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _history_tokens(messages, summary):
+    return estimate_tokens(summary or "") + sum(estimate_tokens(msg["text"]) for msg in messages)
+
+
+def messages_to_fold(messages, folded_count, keep_turns, token_budget, summary=None):
+    # Messages older than the last `keep_turns` exchanges are folded once they and the notes exceed the
+    # budget. The recent exchanges are not counted: they are sent verbatim anyway, and counting them would
+    # fold a single exchange (one extra call) on every turn once they alone go over the budget.
+    keep_from = max(folded_count, len(messages) - keep_turns * 2)
+    # Start the verbatim part on a student message so turns keep alternating after the notes.
+    while keep_from > folded_count and messages[keep_from]["role"] != "user":
+        keep_from -= 1
+    if keep_from <= folded_count:
+        return []
+    if _history_tokens(messages[folded_count:keep_from], summary) <= token_budget:
+        return []
+    return messages[folded_count:keep_from]
+
+
+def build_summary_prompt(summary, messages):
+    transcript = "\n\n".join(
+        f"{'Teacher' if msg['role'] == 'model' else 'Student'}: {msg['text']}" for msg in messages
+    )
+    return SUMMARY_PROMPT.format(summary=summary or "(none yet)", transcript=transcript)
+
+
+def build_contents(messages, folded_count, summary=None):
+    contents = []
+
+    if summary:
+        contents.append(types.Content(role="user", parts=[types.Part.from_text(
+            text=f"Here are your notes from earlier in our session:\n{summary}"
+        )]))
+        contents.append(types.Content(role="model", parts=[types.Part.from_text(
+            text="Thanks, I'll continue the lesson with those notes in mind."
+        )]))
+
+    for msg in messages[folded_count:]:
+        part = types.Part.from_text(text=msg["text"])
+        contents.append(types.Content(role=msg["role"], parts=[part]))
+
+    return contents
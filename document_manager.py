@@ -0,0 +1,165 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+
+SUPPORTED_TYPES = ("pdf", "docx", "txt")
+
+# Below this many pages a pool costs more in process start-up and pickling than it saves.
+PARALLEL_MIN_PAGES = 40
+RANGES_PER_WORKER = 2
+
+
+def file_type(filename):
+    extension = os.path.splitext(filename.lower())[1].lstrip(".")
+    if extension not in SUPPORTED_TYPES:
+        raise ValueError(f"Unsupported file type '{extension or filename}'. Upload a PDF, DOCX or TXT file.")
+    return extension
+
+
+def _pdf_reader(data):
+    from pypdf import PdfReader
+
+    # PdfReader only reads the cross-reference table up front; page content is parsed when a page is used.
+    return PdfReader(BytesIO(data))
+
+
+# Pool worker state: the last PDF this worker opened, as (path, reader).
+_worker_pdf = None
+
+
+def _extract_pdf_range(path, start, end):
+    # Runs in a pool worker. Only the path and page numbers are pickled; each worker reads and parses the
+    # file once (a PdfReader cannot be pickled) and keeps it for the other ranges of the same document.
+    global _worker_pdf
+    if _worker_pdf is None or _worker_pdf[0] != path:
+        from pypdf import PdfReader
+
+        _worker_pdf = (path, PdfReader(path))
+    reader = _worker_pdf[1]
+    return [(number, reader.pages[number].extract_text() or "") for number in range(start, end)]
+
+
+def _clamp_range(page_count, page_range):
+    start, end = page_range or (0, page_count)
+    start = max(0, min(start, page_count))
+    return start, max(start, min(end, page_count))
+
+
+def _page_ranges(start, end, parts):
+    size = max(1, -(-(end - start) // parts))
+    return [(first, min(first + size, end)) for first in range(start, end, size)]
+
+
+def _pdf_metadata(reader):
+    info = reader.metadata or {}
+    return {
+        "page_count": len(reader.pages),
+        "title": info.get("/Title"),
+        "author": info.get("/Author"),
+    }
+
+
+def _iter_pdf(data, reader, start, end, pool=None, workers=1):
+    if pool is None or workers < 2 or end - start < PARALLEL_MIN_PAGES:
+        for number in range(start, end):
+            yield number, reader.pages[number].extract_text() or ""
+        return
+
+    # The bytes go to the workers through a temporary file rather than being pickled with every range.
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        tmp.write(data)
+    futures = []
+    try:
+        futures = [
+            pool.submit(_extract_pdf_range, tmp.name, first, last)
+            for first, last in _page_ranges(start, end, workers * RANGES_PER_WORKER)
+        ]
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Reached when the consumer stops early (e.g. at the character cap): drop ranges not yet started.
+        for future in futures:
+            future.cancel()
+        os.remove(tmp.name)
+
+
+def _open(data, filename):
+    kind = file_type(filename)
+    if kind == "pdf":
+        reader = _pdf_reader(data)
+        return kind, reader, _pdf_metadata(reader)
+    if kind == "docx":
+        from docx import Document
+
+        document = Document(BytesIO(data))
+        properties = document.core_properties
+        # DOCX has no fixed pagination; the whole document is reported as a single page.
+        return kind, document, {"page_count": 1, "title": properties.title, "author": properties.author}
+    return kind, None, {"page_count": 1, "title": None, "author": None}
+
+
+def _iter_opened(kind, source, data, start, end, pool=None, workers=1):
+    if kind == "pdf":
+        yield from _iter_pdf(data, source, start, end, pool, workers)
+    elif start < end and kind == "docx":
+        yield 0, "\n".join(paragraph.text for paragraph in source.paragraphs)
+    elif start < end:
+        yield 0, data.decode("utf-8", errors="replace")
+
+
+def _capped(pages, max_chars):
+    total = 0
+    for number, text in pages:
+        if max_chars is not None and total + len(text) > max_chars:
+            yield number, text[:max_chars - total], True
+            return
+        total += len(text)
+        yield number, text, False
+
+
+def count_pages(data, filename):
+    return _open(data, filename)[2]["page_count"]
+
+
+def iter_pages(data, filename, page_range=None, max_chars=None, pool=None, workers=1):
+    # Streams {"number", "text", "chars"} dicts for the pages in `page_range` (0-based, end exclusive),
+    # reading each page only when the consumer asks for it and stopping once `max_chars` is reached.
+    kind, source, metadata = _open(data, filename)
+    start, end = _clamp_range(metadata["page_count"], page_range)
+    for number, text, _ in _capped(_iter_opened(kind, source, data, start, end, pool, workers), max_chars):
+        yield {"number": number + 1, "text": text, "chars": len(text)}
+
+
+def extract_document(data, filename, pool=None, workers=1, page_range=None, max_chars=None):
+    kind, source, metadata = _open(data, filename)
+    start, end = _clamp_range(metadata["page_count"], page_range)
+
+    pages = []
+    truncated = False
+    for number, text, truncated in _capped(_iter_opened(kind, source, data, start, end, pool, workers), max_chars):
+        pages.append({"number": number + 1, "text": text, "chars": len(text)})
+
+    metadata.update({
+        "name": filename,
+        "type": kind,
+        "bytes": len(data),
+        "page_range": (start + 1, end),
+        "truncated": truncated,
+    })
+    return {
+        # One join over all pages; building the text with += copies it again for every page.
+        "text": "\n".join(page["text"] for page in pages if page["text"]),
+        "pages": pages,
+        "metadata": metadata,
+    }
+
+
+def content_key(data, filename):
+    # The type is part of the key: the same bytes uploaded as .txt and as .pdf extract differently.
+    return f"{file_type(filename)}:{hashlib.sha256(data).hexdigest()}"
+
+
+def document_size(document):
+    # The text is held twice (per page and joined), plus a rough allowance for each page's dict.
+    return 2 * len(document["text"].encode("utf-8")) + 200 * len(document["pages"])
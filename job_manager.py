@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import streamlit as st
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Heavy jobs allowed to run at once per kind in this process; anything beyond waits in the queue.
+DEFAULT_LIMITS = {"transcription": 2, "tts": 2}
+MAX_QUEUED_PER_KIND = 20
+RESULT_TTL_SECONDS = 60 * 60
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, kind, label, owner):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.label = label
+        # Only the session (or signed-in user) that submitted the job can look it up again.
+        self.owner = owner
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        # Whatever part of the result is usable before the job finishes, if the job publishes one.
+        self.partial = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def update(self, progress, message=None):
+        self.progress = min(1.0, max(0.0, progress))
+        if message:
+            self.message = message
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class JobManager:
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self._executors = {
+            kind: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"{kind}-job")
+            for kind, limit in self.limits.items()
+        }
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired(self):
+        cutoff = time.time() - RESULT_TTL_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def submit(self, kind, label, owner, fn, *args, **kwargs):
+        # `fn` receives the Job as its first argument so it can report progress; it must not call st.*.
+        job = Job(kind, label, owner)
+
+        with self._lock:
+            self._purge_expired()
+            queued = sum(1 for other in self._jobs.values() if other.kind == kind and other.status == QUEUED)
+            if queued >= MAX_QUEUED_PER_KIND:
+                raise QueueFull(f"Too many {kind} jobs are waiting right now. Please try again in a few minutes.")
+            self._jobs[job.id] = job
+
+        self._executors[kind].submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        job.message = "Working..."
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.update(1.0, "Done")
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id, owner):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def active_counts(self):
+        with self._lock:
+            counts = {kind: {QUEUED: 0, RUNNING: 0} for kind in self.limits}
+            for job in self._jobs.values():
+                if not job.finished:
+                    counts[job.kind][job.status] += 1
+            return counts
+
+
+def default_worker_count():
+    return max(1, min(4, (os.cpu_count() or 1) // 2))
+
+
+def create_process_pool(workers, initializer=None, initargs=()):
+    # spawn rather than fork: forking a process that already holds threads (Streamlit's, torch's) can deadlock.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=initializer,
+        initargs=initargs,
+    )
+
+
+class ProcessPoolHolder:
+    # A process pool is unusable for good once one of its workers dies (a failed model download in the
+    # initializer, an OOM kill...); the holder swaps in a fresh pool so one crash doesn't outlive itself.
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._factory()
+            return self._pool
+
+    def discard(self, pool):
+        # Only the pool that actually broke is replaced; another caller may have already done it.
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn):
+        # `fn(pool)` is retried once on a fresh pool if the first one breaks while it runs.
+        pool = self.get()
+        try:
+            return fn(pool)
+        except BrokenProcessPool:
+            self.discard(pool)
+        return fn(self.get())
+
+
+@st.cache_resource
+def get_job_manager():
+    return JobManager({
+        "transcription": int(st.secrets.get("MAX_TRANSCRIPTION_JOBS", DEFAULT_LIMITS["transcription"])),
+        "tts": int(st.secrets.get("MAX_TTS_JOBS", DEFAULT_LIMITS["tts"])),
+    })
+
+
+def session_owner():
+    # Signed-in users own their jobs across reloads and devices; a guest's jobs belong to the browser session.
+    if "user" in st.session_state:
+        return f"user:{st.session_state.user.id}"
+    if "job_owner" not in st.session_state:
+        st.session_state.job_owner = f"session:{uuid.uuid4().hex}"
+    return st.session_state.job_owner
+
+
+def remember_job(state_key, job_id):
+    # Kept in the URL as well as the session so a reloaded or reconnected tab can pick the job up again.
+    st.session_state[state_key] = job_id
+    if job_id is None:
+        st.query_params.pop(state_key, None)
+    else:
+        st.query_params[state_key] = job_id
+
+
+def restore_job(state_key):
+    if st.session_state.get(state_key) is None and state_key in st.query_params:
+        job_id = st.query_params[state_key]
+        # A shared or copied link must not hand someone else's job (and its result) to this session.
+        if get_job_manager().get(job_id, session_owner()) is None:
+            st.query_params.pop(state_key, None)
+        else:
+            st.session_state[state_key] = job_id
+    return st.session_state.get(state_key)
@@ -1,10 +1,11 @@
 import streamlit as st
-import json
 import io, time
+import math
+from concurrent.futures import ThreadPoolExecutor
 from docx import Document
 from streamlit_autorefresh import st_autorefresh
-from google.genai.errors import APIError
-from utils import get_gemini_client
+from utils import (get_gemini_client, generate_content, handle_gemini_error, parse_questions, GEMINI_ERRORS,
+                   QUESTION_GENERATION_CONFIG)
 import usage_manager as um
 
 if "performance_log" not in st.session_state:
@@ -56,11 +57,111 @@ def calculate_grade(score, total):
         return "F", "Fail. You are not ready for this exam."
 
 def clear_exam_session_state():
-    for key in ["exam_stage", "exam_data", "exam_answers", "start_time", "duration_mins", "exam_score", "course_code"]:
+    for key in ["exam_stage", "exam_data", "exam_answers", "start_time", "duration_mins", "exam_score", "course_code",
+                "exam_shortfall"]:
         if key in st.session_state:
             del st.session_state[key]
 
 
+EXAM_BATCH_SIZE = 10
+MAX_BATCH_ATTEMPTS = 3
+MAX_TOP_UP_ROUNDS = 1
+
+def build_exam_prompt(course_code, topic, count, part, total_parts):
+    part_context = ""
+    if total_parts > 1:
+        part_context = (f"This is section {part} of {total_parts} of the paper. Focus on a different sub-area of "
+                        f"the course than the other sections so that no question is repeated across the paper.")
+
+    return f"""
+        You are a strict university professor setting a final exam.
+        Course: {course_code}
+        Topic: {topic}
+        {part_context}
+
+        Generate {count} HARD, examination-standard multiple-choice questions.
+        These should not be simple definitions. They should require critical thinking or application of concepts.
+
+        OUTPUT FORMAT:
+        Return ONLY a raw JSON list of dictionaries. Do NOT use Markdown code blocks.
+        Each dictionary must have these keys:
+        - "question": complex scenario or problem statement
+        - "options": A list of strings (e.g., ["Option A", "Option B", "Option C", "Option D"])
+        - "answer": The exact string of the correct option
+        - "explanation": A short explanation of why it is correct
+    """
+
+def generate_exam_batch(prompt):
+    contents = [prompt]
+    response = generate_content(client, "Exam Simulator", model=model_name, contents=contents,
+                                config=QUESTION_GENERATION_CONFIG)
+    try:
+        return parse_questions(response.text or "")
+    except ValueError:
+        client.models.discard(model=model_name, contents=contents, config=QUESTION_GENERATION_CONFIG)
+        raise
+
+def run_exam_batches(prompts):
+    results = {}
+    errors = {}
+    pending = list(prompts)
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        for _ in range(MAX_BATCH_ATTEMPTS):
+            futures = {part: executor.submit(generate_exam_batch, prompts[part]) for part in pending}
+            pending = []
+            for part, future in futures.items():
+                try:
+                    results[part] = future.result()
+                except (ValueError, *GEMINI_ERRORS) as e:
+                    # One failed section must not throw away the ones that succeeded.
+                    errors[part] = e
+                    pending.append(part)
+            if not pending:
+                break
+    return results, errors
+
+def generate_exam_questions(course_code, topic, num_q):
+    total_parts = math.ceil(num_q / EXAM_BATCH_SIZE)
+    prompts = {
+        part: build_exam_prompt(course_code, topic, min(EXAM_BATCH_SIZE, num_q - (part - 1) * EXAM_BATCH_SIZE),
+                                part, total_parts)
+        for part in range(1, total_parts + 1)
+    }
+
+    questions = []
+    seen = set()
+    first_error = None
+    for _ in range(1 + MAX_TOP_UP_ROUNDS):
+        results, errors = run_exam_batches(prompts)
+        if errors and first_error is None:
+            first_error = errors[min(errors)]
+
+        for part in sorted(results):
+            for q in results[part]:
+                fingerprint = " ".join(q["question"].lower().split())
+                if fingerprint not in seen:
+                    seen.add(fingerprint)
+                    questions.append(q)
+
+        # Sections that kept failing and duplicates removed above leave the paper short; ask for the rest.
+        missing = num_q - len(questions)
+        if missing <= 0:
+            break
+        top_up_parts = math.ceil(missing / EXAM_BATCH_SIZE)
+        prompts = {
+            total_parts + part: build_exam_prompt(course_code, topic,
+                                                  min(EXAM_BATCH_SIZE, missing - (part - 1) * EXAM_BATCH_SIZE),
+                                                  total_parts + part, total_parts + top_up_parts)
+            for part in range(1, top_up_parts + 1)
+        }
+        total_parts += top_up_parts
+
+    if not questions:
+        raise first_error
+
+    return questions[:num_q]
+
+
 model_name = "gemini-2.5-flash"
 client = get_gemini_client()
 
@@ -87,44 +188,23 @@ if st.session_state.exam_stage == "setup":
             with st.spinner("Prof. LogeekMind is preparing your exam papers..."):
                 st.session_state.course_code = course_code
                 st.session_state.exam_topic = topic
-                prompt = f"""
-                    You are a strict university professor setting a final exam.
-                    Course: {course_code}
-                    Topic: {topic}
-
-                    Generate {num_q} HARD, examination-standard multiple-choice questions.
-                    These should not be simple definitions. They should require critical thinking or application of concepts.
-
-                    OUTPUT FORMAT:
-                    Return ONLY a raw JSON list of dictionaries. Do NOT use Markdown code blocks.
-                    Each dictionary must have these keys:
-                    - "question": complex scenario or problem statement
-                    - "options": A list of strings (e.g., ["Option A", "Option B", "Option C", "Option D"])
-                    - "answer": The exact string of the correct option
-                    - "explanation": A short explanation of why it is correct
-                """
                 try:
-                    response = client.models.generate_content(model=model_name, contents=[prompt])
-                    cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
-                    st.session_state.exam_data = json.loads(cleaned_text)
-                except json.JSONDecodeError as e:
-                    st.error(f"JSONDecodeError: AI output malformed: {e}")
+                    st.session_state.exam_data = generate_exam_questions(course_code, topic, num_q)
+                except ValueError as e:
+                    st.error(f"AI output malformed: {e}")
                     st.stop()
-                except APIError as e:
-                    error_text = str(e)
-                    if "429" in error_text or "RESOURCE_EXHAUSTED" in error_text.upper():
-                        if "api_key" in st.session_state:
-                            del st.session_state.api_key
-                        st.error("🚨 Quota Exceeded! Gemini API limit reached.")
-                    elif "503" in error_text:
-                        st.error("Gemini AI model busy. Try again later.")
-                    else:
-                        st.error("API error during exam generation.")
+                except GEMINI_ERRORS as e:
+                    handle_gemini_error(e)
                     st.stop()
                 except Exception as e:
                     st.error(f"Unexpected error: {e}")
                     st.stop()
 
+                # Shown on the exam screen, since this run ends in a rerun.
+                st.session_state.exam_shortfall = None
+                if len(st.session_state.exam_data) < num_q:
+                    st.session_state.exam_shortfall = (len(st.session_state.exam_data), num_q)
+
                 # Set timers and stage
                 st.session_state.duration_mins = duration
                 st.session_state.start_time = time.time()
@@ -143,6 +223,10 @@ elif st.session_state.exam_stage == "active":
     if total_questions == 0:
         st.warning("No exam data found. Please restart and generate the exam.")
     else:
+        if st.session_state.get("exam_shortfall"):
+            generated, requested = st.session_state.exam_shortfall
+            st.warning(f"Only {generated} of the {requested} requested questions could be generated for this exam.")
+
         # Timer
         mins, secs = divmod(int(max(0, remaining_seconds)), 60)
         timer_color = "red" if mins < 2 else "green"
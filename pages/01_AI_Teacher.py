@@ -1,11 +1,16 @@
 import streamlit as st
-from google.genai.errors import APIError
 from google.genai import types
-from utils import get_gemini_client
+from google.genai.errors import APIError
+from utils import (get_gemini_client, get_context_cache_manager, generate_content, generate_content_stream,
+                   stream_text, handle_gemini_error, GEMINI_ERRORS, logger)
 import usage_manager as um
+import conversation_manager as cm
 
 model_name = "gemini-2.5-flash"
 
+HISTORY_KEEP_TURNS = int(st.secrets.get("AI_TEACHER_HISTORY_TURNS", 4))
+HISTORY_TOKEN_BUDGET = int(st.secrets.get("AI_TEACHER_HISTORY_TOKEN_BUDGET", 6000))
+
 System_instruction = AI_TEACHER_INSTRUCTIONS = (
     """
 You are LogeekMind's AI Teacher(LogeekMind is an AI powered academic assistant and educational technology platform conceptualised,developed and created by Solomon Adenuga a.k.a Logeek, a Lagos State University student studying educational technology to simplify, accelerate and improve smarter learning. This application has 10 core academic features: AI Teacher, Course Outline generator, study scheduler, GPA Calculator, Smart Quiz Generator, exam simulator, lecture notes to audio converter, lecture audio to text converter, Notes Summarizer and homework assistant, there's also a Live community chat section for registered users.), an intelligent, patient, and highly skilled academic instructor designed to teach any 
@@ -103,6 +108,64 @@ if "saved_notes" not in st.session_state:
 if "last_prompt" not in st.session_state:
     st.session_state.last_prompt = None
 
+if "history_summary" not in st.session_state:
+    st.session_state.history_summary = None
+
+if "history_folded_count" not in st.session_state:
+    st.session_state.history_folded_count = 0
+
+stream_responses = st.sidebar.toggle("⚡ Stream answers as they are written", value=True,
+                                     key="ai_teacher_streaming")
+
+
+def compact_history():
+    if client is None:
+        return
+    to_fold = cm.messages_to_fold(st.session_state.messages, st.session_state.history_folded_count,
+                                  HISTORY_KEEP_TURNS, HISTORY_TOKEN_BUDGET, st.session_state.history_summary)
+    if not to_fold:
+        return
+
+    try:
+        response = generate_content(
+            client,
+            "AI Teacher",
+            model=model_name,
+            contents=[cm.build_summary_prompt(st.session_state.history_summary, to_fold)],
+        )
+    except GEMINI_ERRORS as e:
+        # Not fatal: the next turn just goes out with the longer history.
+        logger.warning("AI Teacher history compaction failed: %s", e)
+        return
+
+    if response.text:
+        st.session_state.history_summary = response.text
+        st.session_state.history_folded_count += len(to_fold)
+
+
+CACHED_CONTENT_ERROR_CODES = {400, 403, 404}
+
+def ask_teacher(contents, config):
+    if stream_responses:
+        response_stream = generate_content_stream(
+            client,
+            "AI Teacher",
+            model=model_name,
+            config=config,
+            contents=contents,
+        )
+        return st.write_stream(stream_text(response_stream, feature="AI Teacher"))
+
+    response = generate_content(
+        client,
+        "AI Teacher",
+        model=model_name,
+        config=config,
+        contents=contents,
+    )
+    st.markdown(response.text)
+    return response.text
+
 
 for message in st.session_state.messages:
     role = "assistant" if message["role"] == "model" else "user"
@@ -121,27 +184,27 @@ if prompt := st.chat_input("Ask your teacher a question..."):
     with st.chat_message("user"):
         st.markdown(prompt)
 
+    answered = False
     with st.spinner("📝 Preparing Notes..."):
         try:
-            contents = []
-
-            for msg in st.session_state.messages:
-                part = types.Part.from_text(text=msg["text"])
-                content_obj = types.Content(role=msg["role"], parts=[part])
-                contents.append(content_obj)
+            contents = cm.build_contents(st.session_state.messages, st.session_state.history_folded_count,
+                                         st.session_state.history_summary)
 
-            response = client.models.generate_content(
-                model=model_name,
-                config=types.GenerateContentConfig(system_instruction=System_instruction),
-                contents=contents,
-            )
-
-            ai_text = response.text
+            context_cache = get_context_cache_manager()
+            config = context_cache.config_for(client, client.key_id, model_name, System_instruction)
 
             with st.chat_message("assistant"):
-                st.markdown(ai_text)
+                try:
+                    ai_text = ask_teacher(contents, config)
+                except APIError as e:
+                    # The server-side cache can expire or be evicted before our refresh; fall back to inline.
+                    if config.cached_content is None or e.code not in CACHED_CONTENT_ERROR_CODES:
+                        raise
+                    context_cache.invalidate(client.key_id, model_name, System_instruction)
+                    ai_text = ask_teacher(contents, types.GenerateContentConfig(system_instruction=System_instruction))
 
             st.session_state.messages.append({"role": "model", "text": ai_text})
+            answered = True
 
             st.session_state.saved_notes = ai_text
 
@@ -162,36 +225,30 @@ if prompt := st.chat_input("Ask your teacher a question..."):
                         st.session_state.saved_notes = None
                         st.session_state.last_prompt = None
                         st.session_state.messages = []
+                        st.session_state.history_summary = None
+                        st.session_state.history_folded_count = 0
                         st.rerun()
                 else:
                     st.info("Creating an account is free and saves your progress!")
                     st.page_link("pages/00_login.py", icon="🔑", label="Login/Signup")
 
-        except APIError as e:
-            error = str(e)
-
-            if "429" in error or "RESOURCE_EXHAUSTED" in error.upper():
-                if "api_key" in st.session_state:
-                    del st.session_state.api_key
-                st.error("🚨 Quota Exceeded! The Gemini API key has reached its limit.")
-                st.stop()
-
-            elif "503" in error:
-                st.warning("Gemini is experiencing high traffic. Try again soon.")
-                st.info(
-                    "In the meantime, try other features "
-                    "(GPA Calculator, Study Scheduler, Lecture Note-to-Audio Converter, Audio-to-Text Converter)"
-                )
-            else:
-                st.error(f"API Error: {e}")
+        except GEMINI_ERRORS as e:
+            handle_gemini_error(e)
 
         except Exception as e:
             st.error(f"Unexpected error: {e}")
 
+    # Only affects the next turn, so the notes are updated after this answer is already on screen. A failed turn
+    # skips it: a second call right after Gemini said it is overloaded would only add to the load.
+    if answered:
+        compact_history()
+
 
 st.markdown("---")
 if st.button("🆕 Start New Teaching Session"):
     st.session_state.messages = []
     st.session_state.saved_notes = None
     st.session_state.last_prompt = None
+    st.session_state.history_summary = None
+    st.session_state.history_folded_count = 0
     st.rerun()
\ No newline at end of file
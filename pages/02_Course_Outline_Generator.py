@@ -1,6 +1,5 @@
 import streamlit as st
-from google.genai.errors import APIError
-from utils import get_gemini_client
+from utils import get_gemini_client, generate_content, handle_gemini_error, GEMINI_ERRORS
 from docx import Document
 import io
 import usage_manager as um
@@ -65,7 +64,9 @@ if submitted:
 
     with st.spinner(f"Generating 12-week outline for {course_full_name}..."):
         try:
-            response = client.models.generate_content(
+            response = generate_content(
+                client,
+                "Course Outline Generator",
                 model=model_name,
                 contents=[OUTLINE_PROMPT]
             )
@@ -83,17 +84,8 @@ if submitted:
                 um.log_usage(auth_user_id, username, "Course Outline Generator", "generated", {"course":
                                                                                                  course_full_name})
 
-        except APIError as e:
-            msg = str(e)
-            if "429" in msg or "RESOURCE_EXHAUSTED" in msg.upper():
-                st.error("🚨 **Quota Exceeded!** The Gemini API key has hit its limit.")
-                if "api_key" in st.session_state:
-                    del st.session_state.api_key
-                st.stop()
-            elif "503" in msg:
-                st.warning("The Gemini AI model is currently experiencing high traffic. Please try again later.")
-            else:
-                st.error(f"API Error: {e}")
+        except GEMINI_ERRORS as e:
+            handle_gemini_error(e)
 
         except Exception as e:
             st.error(f"Unexpected Error: {e}")
@@ -1,7 +1,6 @@
 import streamlit as st
 from PIL import Image
-from google.genai.errors import APIError
-from utils import get_gemini_client
+from utils import get_gemini_client, generate_content, handle_gemini_error, GEMINI_ERRORS
 from docx import Document
 import io, time
 import usage_manager as um
@@ -70,7 +69,9 @@ def generate_solution():
         """
 
         with st.spinner("Generating Solution..."):
-            response = client.models.generate_content(
+            response = generate_content(
+                client,
+                "Homework Assistant",
                 model=model_name,
                 contents=[st.session_state.hw_image, full_prompt]
             )
@@ -88,18 +89,8 @@ def generate_solution():
         doc_io.seek(0)
         st.session_state.hw_doc = doc_io
 
-    except APIError as e:
-        error_text = str(e)
-        if "429" in error_text or "RESOURCE_EXHAUSTED" in error_text.upper():
-            if "api_key" in st.session_state:
-                del st.session_state.api_key
-            st.error("🚨 **Quota Exceeded!** The Gemini API key has hit its limit")
-            st.stop()
-        elif "503" in error_text:
-            st.warning("Gemini is experiencing heavy traffic. Try again shortly.")
-            st.info("Meanwhile, explore other non-AI tools like GPA Calculator or Study Scheduler.")
-        else:
-            st.error(f"API Error: {e}")
+    except GEMINI_ERRORS as e:
+        handle_gemini_error(e)
     except Exception as e:
         st.error(f"Unexpected Error: {e}")
 
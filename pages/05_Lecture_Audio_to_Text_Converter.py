@@ -1,13 +1,10 @@
 import streamlit as st
-import whisper
-import tempfile
 import os
 import usage_manager as um
-
-
-@st.cache_resource
-def load_whisper_model():
-    return whisper.load_model("base")
+import transcription_manager as tm
+import job_manager as jm
+from utils import (get_transcript_cache, get_transcription_pool, start_transcription_prewarm,
+                   asr_engine, asr_model_size)
 
 st.title("🎧 Lecture Audio-to-Text Converter & Document Generator")
 st.markdown("Upload a lecture audio file to transcribe it and download the text as a .txt.")
@@ -23,18 +20,35 @@ st.warning(
     icon="🚀"
 )
 
-model = load_whisper_model()
-st.success("STT model loaded successfully! Ready for audio")
+job_manager = jm.get_job_manager()
+prewarm = start_transcription_prewarm()
+
+
+@st.fragment(run_every=3)
+def show_engine_status():
+    # Only polls while warming up; the full rerun drops the fragment once the outcome is known.
+    if prewarm.status != prewarm.WARMING:
+        st.rerun()
+    st.info("⏳ The transcription engine is warming up. You can upload and convert now; "
+            "your file will start as soon as it is ready.")
 
 
+if prewarm is not None and prewarm.status == prewarm.WARMING:
+    show_engine_status()
+elif prewarm is not None and prewarm.status == prewarm.FAILED:
+    st.error(f"The transcription engine failed to load: {prewarm.error}. "
+             "Converting a file will try to load it again, and will fail the same way if the problem persists.")
+
 if "audio_file" not in st.session_state:
     st.session_state.audio_file = None
 
-if "audio_path" not in st.session_state:
-    st.session_state.audio_path = None
+if "transcript" not in st.session_state:
+    st.session_state.transcript = None
+
+if "transcript_name" not in st.session_state:
+    st.session_state.transcript_name = None
 
-if "transcribed_text" not in st.session_state:
-    st.session_state.transcribed_text = None
+jm.restore_job("transcription_job")
 
 uploaded_file = st.file_uploader(
     "Upload a lecture audio file (MP3, WAV, M4A, OGG)",
@@ -43,12 +57,7 @@ uploaded_file = st.file_uploader(
 
 if uploaded_file is not None:
     st.session_state.audio_file = uploaded_file
-
-    # Save temporary file
-    with tempfile.NamedTemporaryFile(delete=False,
-                                     suffix=f".{uploaded_file.name.split('.')[-1]}") as tmp:
-        tmp.write(uploaded_file.read())
-        st.session_state.audio_path = tmp.name
+    st.session_state.transcript_name = os.path.splitext(uploaded_file.name)[0]
 
 
 if st.session_state.audio_file:
@@ -59,20 +68,58 @@ def transcribe_audio():
         st.page_link("pages/00_login.py", label="Login/Signup", icon="🔑")
         st.stop()
 
+    audio_file = st.session_state.audio_file
     try:
-        with st.spinner("Converting... this may take a few minutes for long lectures."):
-            result = model.transcribe(st.session_state.audio_path)
-            st.session_state.transcribed_text = result["text"]
+        job_id = job_manager.submit(
+            "transcription",
+            st.session_state.transcript_name,
+            jm.session_owner(),
+            tm.run_transcription_job,
+            get_transcription_pool(),
+            get_transcript_cache(),
+            tm.engine_id(asr_engine(), asr_model_size()),
+            audio_file.getvalue(),
+            os.path.splitext(audio_file.name)[1],
+        )
+    except jm.QueueFull as e:
+        st.warning(str(e))
+        return
 
-    except Exception as e:
-        st.error(f"An error occurred during transcription: {e}")
+    st.session_state.transcript = None
+    jm.remember_job("transcription_job", job_id)
+
+
+@st.fragment(run_every=2)
+def show_transcription_progress():
+    job = job_manager.get(st.session_state.transcription_job, jm.session_owner())
+
+    if job is None:
+        st.warning("This transcription is no longer available. Please convert the file again.")
+        jm.remember_job("transcription_job", None)
+        return
+
+    if not job.finished:
+        st.progress(job.progress, text=f"{job.message} You can leave this page and come back later.")
+        if job.partial is not None and job.partial.segment_count:
+            st.caption("Transcript so far — the rest appears as each part is finished.")
+            st.code(job.partial.text)
+        return
+
+    if job.status == jm.DONE:
+        st.session_state.transcript = job.result
+        st.session_state.transcript_name = job.label
+    else:
+        st.session_state.transcription_error = job.error
+    jm.remember_job("transcription_job", None)
+    st.rerun()
 
 
 col1, col2 = st.columns(2)
 
 with col1:
-    if st.button("Convert and Generate File", type="primary"):
-        if st.session_state.audio_path is None:
+    if st.button("Convert and Generate File", type="primary",
+                 disabled=st.session_state.get("transcription_job") is not None):
+        if st.session_state.audio_file is None:
             st.warning("Please upload an audio file first.")
         else:
             transcribe_audio()
@@ -81,33 +128,51 @@ with col2:
     if st.button("Generate New"):
         # Clear all session data
         st.session_state.audio_file = None
-        st.session_state.audio_path = None
-        st.session_state.transcribed_text = None
+        st.session_state.transcript = None
+        st.session_state.transcript_name = None
+        jm.remember_job("transcription_job", None)
         st.rerun()
 
+if st.session_state.get("transcription_job"):
+    show_transcription_progress()
+
+if st.session_state.get("transcription_error"):
+    st.error(f"An error occurred during transcription: {st.session_state.pop('transcription_error')}")
+
 # SHOW TRANSCRIPTION + DOWNLOAD
-if st.session_state.transcribed_text:
+if st.session_state.transcript:
+    transcript = st.session_state.transcript
     st.subheader("Transcription")
-    st.code(st.session_state.transcribed_text)
+    st.code(transcript.text)
 
     if "user" in st.session_state:
         auth_user_id = st.session_state.user.id
         username = st.session_state.user_profile.get("username", "Scholar")
         um.log_usage(auth_user_id, username, "Lecture Audio to Text Converter", "generated", {"topic": 'N/A'})
 
-    filename = os.path.splitext(st.session_state.audio_file.name)[0] + "_transcription.txt"
+    base_name = f"{st.session_state.transcript_name or 'lecture'}_transcription"
 
     if um.premium_gate("Download Transcript"):
-        download_clicked = st.download_button(
-            label="Download Transcript (.txt)",
-            data=st.session_state.transcribed_text.encode("utf-8"),
-            file_name=filename,
-            mime="text/plain",
-        )
+        download_cols = st.columns(4)
+        downloads = [
+            ("Text (.txt)", transcript.text, "txt", "text/plain"),
+            ("Subtitles (.srt)", transcript.to_srt(), "srt", "application/x-subrip"),
+            ("Captions (.vtt)", transcript.to_vtt(), "vtt", "text/vtt"),
+            ("Timestamps (.json)", transcript.to_json(), "json", "application/json"),
+        ]
+        download_clicked = False
+        for col, (label, data, extension, mime) in zip(download_cols, downloads):
+            with col:
+                download_clicked |= st.download_button(
+                    label=f"Download {label}",
+                    data=data.encode("utf-8"),
+                    file_name=f"{base_name}.{extension}",
+                    mime=mime,
+                )
 
         if download_clicked:
             # Delete transcript immediately after download
-            st.session_state.transcribed_text = None
+            st.session_state.transcript = None
 
     else:
         st.info("Create a free account to download and save your transcripts.")
@@ -1,11 +1,10 @@
 import streamlit as st
-from gtts import gTTS
-import io
 import time
-from pypdf import PdfReader
-from io import BytesIO
-from docx import Document
 import usage_manager as um
+import job_manager as jm
+import tts_manager
+from utils import (get_tts_pool, get_tts_backend, get_tts_cache, extract_uploaded_document,
+                   choose_page_range, document_max_chars)
 
 
 st.title("Lecture Notes-to-Audio Converter 📢")
@@ -31,41 +30,80 @@ if "lecture_text" not in st.session_state:
 if "input_mode" not in st.session_state:
     st.session_state.input_mode = "paste"
 
+job_manager = jm.get_job_manager()
+jm.restore_job("tts_job")
+
+
+def show_tts_parts(parts, total):
+    for number, part in enumerate(parts, start=1):
+        st.markdown(f"**Part {number} of {total}**")
+        st.audio(part, format="audio/mp3")
+
+
+def show_tts_output():
+    parts = st.session_state.get("tts_parts")
+    if parts:
+        st.caption("All parts are ready. Keep listening here, or use the full MP3 below.")
+        show_tts_parts(parts, len(parts))
+        if st.button("Dismiss parts"):
+            st.session_state.tts_parts = None
+            st.rerun()
+
+    if st.session_state.audio_data is not None:
+        st.success("✔ Audio generated!")
+        st.audio(st.session_state.audio_data, format="audio/mp3")
+        if um.premium_gate("Download Transcript"):
+                download_clicked = st.download_button(
+                    label="⬇ Download Audio Lecture",
+                    data=st.session_state.audio_data,
+                    file_name=st.session_state.audio_filename,
+                    mime="audio/mp3"
+                )
+                if download_clicked:
+                    del st.session_state.audio_data
+                    del st.session_state.audio_filename
+                    del st.session_state.lecture_text
+                    st.session_state.tts_parts = None
+                    st.rerun()
+        else:
+                st.info("Create an account to download.")
+                st.page_link("pages/00_login.py", label="Login/Signup", icon="🔑")
+                st.stop()
 
-def extract_text_from_uploaded_file(file):
-    filename = file.name.lower()
-
-    if filename.endswith(".pdf"):
-        pdf_reader = PdfReader(BytesIO(file.read()))
-        text = ""
-        for page in pdf_reader.pages:
-            extracted = page.extract_text()
-            if extracted:
-                text += extracted + "\n"
-        return True, text
-
-    elif filename.endswith(".docx"):
-        document = Document(BytesIO(file.read()))
-        text = "\n".join(p.text for p in document.paragraphs)
-        return True, text
-
-    elif filename.endswith(".txt"):
-        return True, file.read().decode("utf-8")
 
-    return False, None
+@st.fragment(run_every=2)
+def show_tts_progress():
+    job = job_manager.get(st.session_state.tts_job, jm.session_owner())
 
+    if job is None:
+        st.warning("This audio lecture is no longer available. Please generate it again.")
+        jm.remember_job("tts_job", None)
+        return
 
-def convert_to_audio(text):
-    try:
-        tts = gTTS(text=text, lang="en")
+    if not job.finished:
+        st.progress(job.progress, text=f"{job.message} You can leave this page and come back later.")
+        if job.partial is not None:
+            parts = job.partial.ready_parts()
+            if parts:
+                st.caption("Start listening now — the next parts appear here as they are generated, "
+                           "and the full MP3 will be ready to download when all are done.")
+            show_tts_parts(parts, len(job.partial.parts))
+        return
 
-        audio_buffer = io.BytesIO()
-        tts.write_to_fp(audio_buffer)
-        audio_buffer.seek(0)
+    if job.status == jm.DONE:
+        if "user" in st.session_state:
+            auth_user_id = st.session_state.user.id
+            username = st.session_state.user_profile.get("username", "Scholar")
+            um.log_usage(auth_user_id, username, "Lecture Notes to Audio Converter", "generated", {"topic": 'N/A'})
 
-        return True, audio_buffer
-    except Exception as e:
-        return False, f"Error during audio generation: {e}"
+        st.session_state.audio_filename = job.label
+        st.session_state.audio_data = job.result
+        st.session_state.tts_parts = job.partial.ready_parts() if job.partial is not None else None
+    else:
+        st.session_state.tts_error = job.error
+    jm.remember_job("tts_job", None)
+    # One full rerun: the main script draws the parts again from tts_parts, and this timer is not rendered again.
+    st.rerun()
 
 
 col1, col2 = st.columns(2)
@@ -91,9 +129,13 @@ elif st.session_state.input_mode == "upload":
 
     if uploaded_file:
         with st.spinner("Extracting text…"):
-            ok, lecture_text = extract_text_from_uploaded_file(uploaded_file)
-            if not ok:
-                st.error("Unsupported file format.")
+            try:
+                document = extract_uploaded_document(uploaded_file, choose_page_range(uploaded_file, "tts_pages"))
+                lecture_text = document["text"]
+                if document["metadata"]["truncated"]:
+                    st.warning(f"Only the first {document_max_chars():,} characters of the selected pages are used.")
+            except ValueError as e:
+                st.error(str(e))
                 st.stop()
 
 if lecture_text:
@@ -101,7 +143,10 @@ if lecture_text:
     st.info(f"Notes loaded. Characters: {len(lecture_text)}")
 
 
-if st.button("Generate Audio Lecture"):
+play_while_generating = st.toggle("▶ Start playing while the rest is generated", value=True,
+                                  key="tts_play_while_generating")
+
+if st.button("Generate Audio Lecture", disabled=st.session_state.get("tts_job") is not None):
     if st.session_state.lecture_text:
         if not um.check_guest_limit("Lecture Notes to Audio Converter", limit=1):
             st.page_link("pages/00_login.py", label="Login/Signup", icon="🔑")
@@ -110,41 +155,27 @@ if st.button("Generate Audio Lecture"):
         st.warning("Provide your lecture text or file!")
         st.stop()
 
-    with st.spinner("Generating audio… this may take a few minutes for long notes."):
-        ok, audio_buffer = convert_to_audio(st.session_state.lecture_text)
+    filename = f"Study_notes_audio_{time.strftime('%Y%m%d%H%M')}.mp3"
+    try:
+        job_id = job_manager.submit("tts", filename, jm.session_owner(), tts_manager.run_tts_job, get_tts_pool(),
+                                    get_tts_backend(), st.session_state.lecture_text, get_tts_cache(),
+                                    play_while_generating)
+    except jm.QueueFull as e:
+        st.warning(str(e))
+        st.stop()
+
+    st.session_state.audio_data = None
+    st.session_state.tts_parts = None
+    jm.remember_job("tts_job", job_id)
 
-    if not ok:
-            st.error(audio_buffer)
-            st.stop()
+if st.session_state.get("tts_job"):
+    show_tts_progress()
 
-    if "user" in st.session_state:
-            auth_user_id = st.session_state.user.id
-            username = st.session_state.user_profile.get("username", "Scholar")
-            um.log_usage(auth_user_id, username, "Lecture Notes to Audio Converter", "generated", {"topic": 'N/A'})
+if st.session_state.get("tts_error"):
+    st.error(st.session_state.pop("tts_error"))
 
-    filename = f"Study_notes_audio_{time.strftime('%Y%m%d%H%M')}.mp3"
-    st.session_state.audio_filename = filename
-    st.session_state.audio_data = audio_buffer.getvalue()
-
-if st.session_state.audio_data is not None:
-    st.success("✔ Audio generated!")
-    st.audio(st.session_state.audio_data, format="audio/mp3")
-    if um.premium_gate("Download Transcript"):
-            download_clicked = st.download_button(
-                label="⬇ Download Audio Lecture",
-                data=st.session_state.audio_data,
-                file_name=st.session_state.audio_filename,
-                mime="audio/mp3"
-            )
-            if download_clicked:
-                del st.session_state.audio_data
-                del st.session_state.audio_filename
-                del st.session_state.lecture_text
-                st.rerun()
-    else:
-            st.info("Create an account to download.")
-            st.page_link("pages/00_login.py", label="Login/Signup", icon="🔑")
-            st.stop()
+if not st.session_state.get("tts_job"):
+    show_tts_output()
 
 
 st.markdown("---")
@@ -152,4 +183,6 @@ if st.button("🆕 New Audio Lecture"):
     st.session_state.audio_data = None
     st.session_state.audio_filename = None
     st.session_state.lecture_text = None
+    st.session_state.tts_parts = None
+    jm.remember_job("tts_job", None)
     st.rerun()
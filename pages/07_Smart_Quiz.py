@@ -1,8 +1,7 @@
 import streamlit as st
-from google.genai.errors import APIError
-from utils import get_gemini_client
+from utils import (get_gemini_client, generate_content, handle_gemini_error, parse_questions, GEMINI_ERRORS,
+                   QUESTION_GENERATION_CONFIG)
 import io, time
-import json
 from docx import Document
 import usage_manager as um
 
@@ -73,29 +72,25 @@ if generate_quiz_clicked:
 
     with st.spinner(f"Generating a {num_questions} question quiz on {quiz_topic}"):
         try:
-            response = client.models.generate_content(
+            response = generate_content(
+                client,
+                "Quiz Generator",
                 model=model_name,
-                contents=[QUIZ_PROMPT]
+                contents=[QUIZ_PROMPT],
+                config=QUESTION_GENERATION_CONFIG,
             )
 
-            cleaned_text = response.text.replace("```json", "").replace("```", "").strip()
-            st.session_state.quiz_data = json.loads(cleaned_text)
+            try:
+                st.session_state.quiz_data = parse_questions(response.text or "")
+            except ValueError:
+                client.models.discard(model=model_name, contents=[QUIZ_PROMPT], config=QUESTION_GENERATION_CONFIG)
+                raise
             st.rerun()
 
-        except json.JSONDecodeError:
+        except ValueError:
             st.error("Error: AI output invalid JSON. Please try again.")
-        except APIError as e:
-            error_text = str(e)
-            if "429" in error_text or "RESOURCE_EXHAUSTED" in error_text.upper():
-                if "api_key" in st.session_state:
-                    del st.session_state.api_key
-                st.error("🚨 **Quota Exceeded!** The Gemini API key has hit its limit")
-                st.stop()
-            elif "503" in error_text:
-                st.markdown("The Gemini AI model is currently experiencing high traffic. Please try again later.")
-                st.info("Meanwhile, try other non-AI features like GPA Calculator, Study Scheduler, etc.")
-            else:
-                st.error(f"An API error occurred during generation: {e}")
+        except GEMINI_ERRORS as e:
+            handle_gemini_error(e)
         except Exception as e:
             st.error(f"Error: {e}")
 
@@ -142,7 +137,7 @@ if st.session_state.quiz_data:
                 user_id=user_id,
                 feature="Quiz Generator",
                 score=score,
-                total_questions=num_questions,
+                total_questions=len(st.session_state.quiz_data),
                 correct_answers=score
             )
 
@@ -154,7 +149,7 @@ if st.session_state.quiz_data:
         st.session_state.performance_log.append({
             "type": "quiz",
             "topic": quiz_topic,
-            "total": num_questions,
+            "total": len(st.session_state.quiz_data),
             "score": st.session_state.quiz_score,
             "percentage": pct,
             "difficulty": difficulty,
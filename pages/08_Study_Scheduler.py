@@ -1,8 +1,7 @@
 import streamlit as st
 import pandas as pd
 import datetime
-from google.genai.errors import APIError
-from utils import get_gemini_client
+from utils import get_gemini_client, generate_content, handle_gemini_error, GEMINI_ERRORS
 import usage_manager as um
 
 model_name = "gemini-2.5-flash"
@@ -69,7 +68,9 @@ if submitted:
 
     with st.spinner("Crafting your personalized study schedule..."):
         try:
-            response = client.models.generate_content(
+            response = generate_content(
+                client,
+                "Study Schedule Generator",
                 model=model_name,
                 contents=[prompt]
             )
@@ -84,17 +85,8 @@ if submitted:
                 um.log_usage(auth_user_id, username, "Study Schedule Generator", "generated", {"course": course_name})
 
 
-        except APIError as e:
-            msg = str(e)
-            if "429" in msg or "RESOURCE_EXHAUSTED" in msg.upper():
-                if "api_key" in st.session_state:
-                    del st.session_state.api_key
-                st.error("🚨 **Quota Exceeded!** The Gemini API key has hit its limit.")
-                st.stop()
-            elif "503" in msg:
-                st.warning("The Gemini AI model is currently experiencing high traffic. Please try again later.")
-            else:
-                st.error(f"API Error: {e}")
+        except GEMINI_ERRORS as e:
+            handle_gemini_error(e)
         except Exception as e:
             st.error(f"Unexpected Error: {e}")
 
@@ -1,11 +1,10 @@
 import streamlit as st
-from pypdf import PdfReader
-from io import BytesIO
-from docx import Document
 import usage_manager as um
+from utils import (extract_uploaded_document, choose_page_range, get_summarizer_pool, worker_count,
+                   document_max_chars)
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.nlp.tokenizers import Tokenizer
-from sumy.summarizers.text_rank import TextRankSummarizer
+import summarizer_manager as sm
 import nltk
 
 try:
@@ -32,49 +31,41 @@ st.warning(
     icon="🚀"
 )
 
+SUMMARIZER_ENGINE = st.secrets.get("SUMMARIZER_ENGINE", "numpy")
+# "flat" ranks every sentence at once, "hierarchical" summarizes chunks in parallel and then their summaries;
+# "auto" switches to hierarchical for documents longer than HIERARCHICAL_MIN_CHARS.
+SUMMARIZER_MODE = st.secrets.get("SUMMARIZER_MODE", "auto")
+HIERARCHICAL_MIN_CHARS = int(st.secrets.get("SUMMARIZER_HIERARCHICAL_MIN_CHARS", 100_000))
+
 if "lecture_text" not in st.session_state:
     st.session_state.lecture_text = None
+if "lecture_pages" not in st.session_state:
+    st.session_state.lecture_pages = None
 if "summary" not in st.session_state:
     st.session_state.summary = None
 if "uploaded_file_name" not in st.session_state:
     st.session_state.uploaded_file_name = None
 
 
-def extract_text_from_uploaded_file(file):
-    file_name = file.name
-    st.session_state.uploaded_file_name = file_name
-
-    if file_name.endswith('.pdf'):
-        pdf_reader = PdfReader(BytesIO(file.read()))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-        return text
-
-    elif file_name.endswith('.docx'):
-        document = Document(BytesIO(file.read()))
-        text = ""
-        for paragraph in document.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+def summarize_text(lecture_text, lecture_pages):
 
-    elif file_name.endswith('.txt'):
-        return file.read().decode("utf-8")
+    hierarchical = SUMMARIZER_MODE == "hierarchical" or (
+        SUMMARIZER_MODE == "auto" and len(lecture_text) > HIERARCHICAL_MIN_CHARS
+    )
 
+    if hierarchical:
+        summary_sentences = get_summarizer_pool().run(lambda pool: sm.summarize_hierarchical(
+            lecture_pages or lecture_text, pool, worker_count("SUMMARIZER_WORKERS"), SUMMARIZER_ENGINE
+        ))
     else:
-        st.error("Unsupported file type. ")
-        return None
-
-def summarize_text(lecture_text):
-
-    parser = PlaintextParser.from_string(lecture_text, Tokenizer("english"))
-    summarizer = TextRankSummarizer()
+        parser = PlaintextParser.from_string(lecture_text, Tokenizer("english"))
+        summarizer = sm.load_summarizer(SUMMARIZER_ENGINE)
 
-    total_sentences = len(parser.document.sentences)
+        total_sentences = len(parser.document.sentences)
 
-    sentence_count = max(10, int(total_sentences * 0.12))
+        sentence_count = max(10, int(total_sentences * 0.12))
 
-    summary_sentences = summarizer(parser.document, sentence_count)
+        summary_sentences = summarizer(parser.document, sentence_count)
 
     key_points = "\n".join([f"- **{str(sentence)}**" for sentence in summary_sentences])
 
@@ -87,7 +78,19 @@ def summarize_text(lecture_text):
 
 uploaded_file = st.file_uploader("Choose a PDF, TXT or DOCX file", type=["pdf", "txt", "docx"])
 if uploaded_file is not None:
-    st.session_state.lecture_text = extract_text_from_uploaded_file(uploaded_file)
+    st.session_state.uploaded_file_name = uploaded_file.name
+    try:
+        document = extract_uploaded_document(uploaded_file, choose_page_range(uploaded_file, "summarizer_pages"))
+        st.session_state.lecture_text = document["text"]
+        # Kept per page so hierarchical chunks break at page boundaries rather than mid-sentence.
+        st.session_state.lecture_pages = [page["text"] for page in document["pages"]]
+        if document["metadata"]["truncated"]:
+            st.warning(f"Only the first {document_max_chars():,} characters of the selected pages are used. "
+                       "Select fewer pages to summarize the rest.")
+    except ValueError as e:
+        st.error(str(e))
+        st.session_state.lecture_text = None
+        st.session_state.lecture_pages = None
 
 if st.session_state.lecture_text:
     st.info(f"Successfully extracted {len(st.session_state.lecture_text):,} characters of text.")
@@ -99,7 +102,8 @@ if st.session_state.lecture_text:
 
         with st.spinner("Generating key points..."):
             try:
-                st.session_state.summary = summarize_text(st.session_state.lecture_text)
+                st.session_state.summary = summarize_text(st.session_state.lecture_text,
+                                                          st.session_state.lecture_pages)
                 st.success("Summary Complete!")
             except Exception as e:
                 st.error(f"An Error occurred: {e}")
@@ -128,6 +132,7 @@ if st.session_state.summary:
             if download_clicked:
                 st.session_state.summary = None
                 st.session_state.lecture_text = None
+                st.session_state.lecture_pages = None
                 st.session_state.uploaded_file_name = None
         else:
             st.info("Creating an account is free and saves your progress!")
@@ -137,5 +142,6 @@ if st.session_state.summary:
         if st.button("Generate New Summary"):
             st.session_state.summary = None
             st.session_state.lecture_text = None
+            st.session_state.lecture_pages = None
             st.session_state.uploaded_file_name = None
             st.rerun()
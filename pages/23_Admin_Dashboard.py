@@ -4,6 +4,7 @@ from supabase import create_client
 from streamlit_autorefresh import st_autorefresh
 import plotly.express as px
 import time
+from utils import get_response_cache, get_transcript_cache, get_tts_cache, get_document_cache
 
 ADMIN_ID = st.secrets["ADMIN_ID"]
 
@@ -75,6 +76,15 @@ def get_daily_activity(days=7):
         return activity
     return pd.Series([0]*days, index=pd.date_range(end=pd.Timestamp.now().date(), periods=days).date)
 
+def show_cache_stats(title, stats, entries_label, details):
+    st.subheader(title)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Cache Hits", stats["hits"] + stats.get("disk_hits", 0))
+    col2.metric("Cache Misses", stats["misses"])
+    col3.metric("Hit Rate", f"{stats['hit_rate']:.0%}")
+    col4.metric(entries_label, stats["entries"])
+    st.caption(details)
+
 # KPI METRICS
 total_users = get_total_users()
 active_users = get_active_users()
@@ -151,5 +161,24 @@ if all_usage_resp.data:
 else:
     st.info("No user activity logs yet.")
 
+# CACHES
+cache_stats = get_response_cache().stats()
+show_cache_stats("Gemini Response Cache", cache_stats, "Cached Responses",
+                 f"Disk hits: {cache_stats['disk_hits']} · Evictions: {cache_stats['evictions']} · "
+                 f"Uncacheable requests: {cache_stats['bypassed']}")
+
+transcript_stats = get_transcript_cache().stats()
+show_cache_stats("Lecture Transcript Cache", transcript_stats, "Cached Transcripts",
+                 f"Size: {transcript_stats['bytes'] / (1024 * 1024):.1f} MB · "
+                 f"Evictions: {transcript_stats['evictions']}")
+
+tts_stats = get_tts_cache().stats()
+show_cache_stats("Notes-to-Audio Chunk Cache", tts_stats, "Cached Chunks",
+                 f"Size on disk: {tts_stats['bytes'] / (1024 * 1024):.1f} MB · Evictions: {tts_stats['evictions']}")
+
+document_stats = get_document_cache().stats()
+show_cache_stats("Document Extraction Cache", document_stats, "Cached Documents",
+                 f"Size: {document_stats['bytes'] / (1024 * 1024):.1f} MB · Evictions: {document_stats['evictions']}")
+
 st.markdown("---")
 st.caption(f"Last refreshed: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
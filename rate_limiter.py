@@ -0,0 +1,167 @@
+import hashlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class RateLimitExceeded(Exception):
+
+    def __init__(self, wait_seconds):
+        self.wait_seconds = wait_seconds
+        super().__init__(f"Rate limit hit! Please wait about {int(wait_seconds) + 1} seconds before trying again.")
+
+
+def key_id(api_key):
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+class TokenBucket:
+
+    def __init__(self, capacity, refill_per_second, db_path=None):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.db_path = db_path
+        self._buckets = {}
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS buckets "
+                    "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+
+    def _refill(self, tokens, updated_at, now):
+        return min(self.capacity, tokens + (now - updated_at) * self.refill_per_second)
+
+    def _load(self, conn, key, now):
+        if conn is None:
+            return self._buckets.get(key, (self.capacity, now))
+        row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+        return row if row is not None else (self.capacity, now)
+
+    def _store(self, conn, key, tokens, now):
+        if conn is None:
+            self._buckets[key] = (tokens, now)
+        else:
+            conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                         (key, tokens, now))
+
+    def take(self, key):
+        # Returns 0 when a token was taken, otherwise the seconds until one is available.
+        # Callers serialise access within the process; SQLite serialises across processes.
+        now = time.time()
+        conn = self._connect() if self.db_path else None
+        try:
+            if conn is not None:
+                conn.execute("BEGIN IMMEDIATE")
+            tokens, updated_at = self._load(conn, key, now)
+            tokens = self._refill(tokens, updated_at, now)
+
+            if tokens >= 1:
+                self._store(conn, key, tokens - 1, now)
+                wait = 0.0
+            else:
+                self._store(conn, key, tokens, now)
+                wait = (1 - tokens) / self.refill_per_second
+
+            if conn is not None:
+                conn.execute("COMMIT")
+            return wait
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def available(self, key):
+        now = time.time()
+        if not self.db_path:
+            tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+            return self._refill(tokens, updated_at, now)
+
+        conn = self._connect()
+        try:
+            tokens, updated_at = self._load(conn, key, now)
+        finally:
+            conn.close()
+        return self._refill(tokens, updated_at, now)
+
+
+class RateLimiter:
+
+    def __init__(self, capacity=5, refill_per_second=10 / 60, db_path=None):
+        self.bucket = TokenBucket(capacity, refill_per_second, db_path)
+        self._condition = threading.Condition()
+        self._queues = defaultdict(deque)
+        self._tickets = itertools.count()
+
+    def _estimate(self, key, position):
+        # Time until the caller at `position` in the queue (0 = head) can take a token.
+        needed = position + 1 - self.bucket.available(key)
+        return max(0.0, needed / self.bucket.refill_per_second)
+
+    def estimate_wait(self, key):
+        with self._condition:
+            return self._estimate(key, len(self._queues[key]))
+
+    def acquire(self, key, max_wait=15.0):
+        deadline = time.monotonic() + max_wait
+
+        with self._condition:
+            queue = self._queues[key]
+            ticket = next(self._tickets)
+            queue.append(ticket)
+
+            try:
+                while True:
+                    position = queue.index(ticket)
+                    if position == 0:
+                        wait = self.bucket.take(key)
+                        if wait == 0:
+                            return
+                    else:
+                        wait = self._estimate(key, position)
+
+                    remaining = deadline - time.monotonic()
+                    if wait > remaining:
+                        raise RateLimitExceeded(wait)
+
+                    self._condition.wait(timeout=wait if position == 0 else remaining)
+            finally:
+                queue.remove(ticket)
+                self._condition.notify_all()
+
+
+class _RateLimitedModels:
+
+    def __init__(self, models, limiter, key, max_wait):
+        self._models = models
+        self._limiter = limiter
+        self._key = key
+        self._max_wait = max_wait
+
+    def generate_content(self, **kwargs):
+        self._limiter.acquire(self._key, self._max_wait)
+        return self._models.generate_content(**kwargs)
+
+    def generate_content_stream(self, **kwargs):
+        self._limiter.acquire(self._key, self._max_wait)
+        return self._models.generate_content_stream(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._models, name)
+
+
+class RateLimitedGeminiClient:
+
+    def __init__(self, client, limiter, api_key, max_wait=15.0):
+        self._client = client
+        self.models = _RateLimitedModels(client.models, limiter, key_id(api_key), max_wait)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,197 @@
+import re
+from collections import deque
+
+import numpy as np
+from scipy import sparse
+
+# Hierarchical mode: chunks are summarized independently, then their summaries are summarized again.
+CHUNK_CHARS = 20_000
+CHUNK_SUMMARY_RATIO = 0.12
+CHUNK_SUMMARY_MIN_SENTENCES = 3
+CHUNK_SUMMARY_MAX_SENTENCES = 15
+HIERARCHICAL_KEY_POINTS = 20
+
+_SECTION_BREAK = re.compile(r"\n\s*\n")
+
+
+class SumyTextRankEngine:
+    # Reference engine: sumy's TextRankSummarizer, which rates every sentence pair in Python (O(n²)).
+
+    name = "sumy"
+
+    def __call__(self, document, sentences_count):
+        from sumy.summarizers.text_rank import TextRankSummarizer
+
+        return TextRankSummarizer()(document, sentences_count)
+
+
+class NumpyTextRankEngine:
+    # Same graph, damping and stopping rule as sumy's TextRank, but the similarity matrix is never built:
+    # each power-iteration step is a couple of sparse products over the sentence/word count matrix.
+
+    name = "numpy"
+
+    damping = 0.85
+    epsilon = 1e-4
+    max_iterations = 1000
+    # Matches sumy's guard for sentences that share no words with any other.
+    _ZERO_DIVISION_PREVENTION = 1e-7
+
+    def __call__(self, document, sentences_count):
+        sentences = document.sentences
+        if not sentences:
+            return ()
+
+        # sumy's TextRank compares lower-cased tokens with no stemming or stop words.
+        ranks = self.rate([[word.lower() for word in sentence.words] for sentence in sentences])
+        return tuple(sentences[index] for index in best_indices(ranks, sentences_count))
+
+    def rate(self, sentences_words):
+        count = len(sentences_words)
+        similarity = _SimilarityOperator(sentences_words)
+
+        scale = 1.0 / (similarity.dot(np.ones(count)) + self._ZERO_DIVISION_PREVENTION)
+        ranks = np.full(count, 1.0 / count)
+        for _ in range(self.max_iterations):
+            next_ranks = (1.0 - self.damping) / count * ranks.sum() + self.damping * similarity.dot(ranks * scale)
+            change = np.linalg.norm(next_ranks - ranks)
+            ranks = next_ranks
+            if change <= self.epsilon:
+                break
+        return ranks
+
+
+class _SimilarityOperator:
+    # Applies TextRank's edge weights, shared_words(i, j) / (log len_i + log len_j), to a vector.
+    # The numerator is C·Cᵀ for the sentence-by-word count matrix C, and the denominator only depends
+    # on the two sentence lengths, so sentences are grouped by length: per group the products stay
+    # sparse, and the length term is applied as a small dense (sentences × distinct lengths) factor.
+
+    def __init__(self, sentences_words):
+        vocabulary = {}
+        indices = []
+        indptr = [0]
+        for words in sentences_words:
+            indices.extend(vocabulary.setdefault(word, len(vocabulary)) for word in words)
+            indptr.append(len(indices))
+
+        count = len(sentences_words)
+        self.counts = sparse.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(count, max(1, len(vocabulary))),
+        )
+        self.counts.sum_duplicates()
+        self.counts_t = self.counts.T.tocsr()
+
+        lengths = np.diff(indptr)
+        log_lengths, self.group = np.unique(np.log(np.maximum(lengths, 1)), return_inverse=True)
+        norm = log_lengths[:, None] + log_lengths[None, :]
+        # Two one-word sentences have a zero denominator; sumy then uses the raw overlap (0 or 1).
+        close_to_zero = np.isclose(norm, 0.0)
+        self.kernel = np.where(close_to_zero, 1.0, 1.0 / np.where(close_to_zero, 1.0, norm))[self.group]
+        self.rows = np.arange(count)
+        self.group_count = len(log_lengths)
+
+    def dot(self, vector):
+        by_group = sparse.csr_matrix((vector, (self.rows, self.group)), shape=(len(vector), self.group_count))
+        word_totals = (self.counts_t @ by_group).toarray()
+        return np.asarray((self.counts @ word_totals) * self.kernel).sum(axis=1)
+
+
+def best_indices(ranks, sentences_count):
+    # Highest rated first with ties in document order (as sumy's stable sort does), returned in document order.
+    return sorted(np.argsort(-ranks, kind="stable")[:sentences_count].tolist())
+
+
+ENGINES = {
+    SumyTextRankEngine.name: SumyTextRankEngine,
+    NumpyTextRankEngine.name: NumpyTextRankEngine,
+}
+
+
+def load_summarizer(engine_name="numpy"):
+    if engine_name not in ENGINES:
+        raise ValueError(f"Unknown summarizer engine '{engine_name}'. Choose one of: {', '.join(ENGINES)}")
+    return ENGINES[engine_name]()
+
+
+def _split_oversized(section, max_chars):
+    # Sections without blank lines (e.g. a PDF page) are cut at line breaks, then at spaces if need be.
+    while len(section) > max_chars:
+        cut = section.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = section.rfind(" ", 0, max_chars)
+        cut = cut if cut > 0 else max_chars
+        yield section[:cut]
+        section = section[cut:].lstrip()
+    if section:
+        yield section
+
+
+def chunk_sections(sections, max_chars=CHUNK_CHARS):
+    # Yields chunks lazily, packing whole sections (e.g. pages) up to `max_chars`.
+    current = []
+    current_chars = 0
+    for section in sections:
+        for piece in _split_oversized(section.strip(), max_chars):
+            if current and current_chars + len(piece) > max_chars:
+                yield "\n\n".join(current)
+                current, current_chars = [], 0
+            current.append(piece)
+            current_chars += len(piece) + 2
+    if current:
+        yield "\n\n".join(current)
+
+
+def chunk_text(text, max_chars=CHUNK_CHARS):
+    # Sections are separated by blank lines.
+    return chunk_sections(_SECTION_BREAK.split(text), max_chars)
+
+
+def parse_document(text):
+    from sumy.nlp.tokenizers import Tokenizer
+    from sumy.parsers.plaintext import PlaintextParser
+
+    return PlaintextParser.from_string(text, Tokenizer("english")).document
+
+
+def _summarize_chunk(text, engine_name):
+    # Runs in a pool worker; returns plain text so only strings cross the process boundary.
+    document = parse_document(text)
+    count = int(len(document.sentences) * CHUNK_SUMMARY_RATIO)
+    count = min(CHUNK_SUMMARY_MAX_SENTENCES, max(CHUNK_SUMMARY_MIN_SENTENCES, count))
+    return " ".join(str(sentence) for sentence in load_summarizer(engine_name)(document, count))
+
+
+def _map_bounded(pool, fn, items, max_in_flight, *args):
+    # Like pool.map, but only `max_in_flight` chunks are held (pickled and queued) at any time.
+    pending = deque()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, item, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
+def summarize_hierarchical(pages, pool, workers, engine_name="numpy", key_points=HIERARCHICAL_KEY_POINTS,
+                           chunk_chars=CHUNK_CHARS):
+    # Map: summarize each chunk in parallel. Reduce: chunk the joined summaries and repeat until they fit
+    # in one chunk, then pick the final key points from that. Every TextRank run sees at most one chunk,
+    # so total work grows linearly with document length and memory with the number of chunks in flight.
+    # `pages` is a list of page texts (or one string); chunks break between pages and between paragraphs.
+    if isinstance(pages, str):
+        pages = [pages]
+    chunks = chunk_sections((section for page in pages for section in _SECTION_BREAK.split(page)), chunk_chars)
+    previous_chars = sum(len(page) for page in pages)
+    while True:
+        summaries = list(_map_bounded(pool, _summarize_chunk, chunks, workers * 2, engine_name))
+        combined = "\n\n".join(summary for summary in summaries if summary)
+        # Stop once it fits, or if a level no longer shrinks (text without sentence breaks).
+        if len(summaries) <= 1 or len(combined) <= chunk_chars or len(combined) >= previous_chars:
+            break
+        previous_chars = len(combined)
+        chunks = chunk_text(combined, chunk_chars)
+
+    document = parse_document(combined)
+    return load_summarizer(engine_name)(document, key_points)
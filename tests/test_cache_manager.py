@@ -0,0 +1,165 @@
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import cache_manager as cm
+from google.genai.errors import APIError
+
+
+class FakeCaches:
+
+    def __init__(self, clock, fail=None, create_delay=0.0):
+        self.clock = clock
+        self.fail = fail
+        self.create_delay = create_delay
+        self.created = []
+        self.updated = []
+
+    def _cached_content(self, name, ttl):
+        expire_time = datetime.fromtimestamp(self.clock.now + int(ttl.rstrip("s")), tz=timezone.utc)
+        return cm.types.CachedContent(name=name, expire_time=expire_time)
+
+    def create(self, model, config):
+        if self.create_delay:
+            time.sleep(self.create_delay)
+        if self.fail:
+            raise self.fail
+        self.created.append(config.system_instruction)
+        return self._cached_content(f"cachedContents/{len(self.created)}", config.ttl)
+
+    def update(self, name, config):
+        self.updated.append(name)
+        return self._cached_content(name, config.ttl)
+
+
+class FakeClient:
+
+    def __init__(self, caches):
+        self.caches = caches
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cm.time, "time", clock.time)
+    return clock
+
+
+MODEL = "gemini-2.5-flash"
+# Long enough for the model's minimum cacheable size.
+INSTRUCTION = "You are a patient teacher. " * 200
+
+
+def _manager():
+    return cm.ContextCacheManager(ttl_seconds=3600, refresh_margin_seconds=300, retry_after_seconds=600)
+
+
+def test_reuses_handle_while_fresh(clock):
+    caches = FakeCaches(clock)
+    manager = _manager()
+
+    first = manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION)
+    clock.now += 3000
+    second = manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION)
+
+    assert first == second == "cachedContents/1"
+    assert len(caches.created) == 1
+    assert caches.updated == []
+
+
+def test_refreshes_inside_margin_by_extending_ttl(clock):
+    caches = FakeCaches(clock)
+    manager = _manager()
+
+    name = manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION)
+    clock.now += 3400
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION) == name
+    assert caches.updated == [name]
+    assert len(caches.created) == 1
+
+    # The extended expiry holds for another full TTL.
+    clock.now += 3000
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION) == name
+    assert caches.updated == [name]
+
+
+def test_stays_inline_after_create_failure_until_retry(clock):
+    caches = FakeCaches(clock, fail=RuntimeError("caching not available"))
+    manager = _manager()
+
+    config = manager.config_for(FakeClient(caches), "key", MODEL, INSTRUCTION)
+    assert config.cached_content is None
+    assert config.system_instruction == INSTRUCTION
+
+    caches.fail = None
+    clock.now += 599
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION) is None
+    assert caches.created == []
+
+    clock.now += 2
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION) == "cachedContents/1"
+
+
+def test_invalidate_then_inline_fallback(clock):
+    caches = FakeCaches(clock)
+    manager = _manager()
+
+    assert manager.config_for(FakeClient(caches), "key", MODEL, INSTRUCTION).cached_content == "cachedContents/1"
+    manager.invalidate("key", MODEL, INSTRUCTION)
+
+    caches.fail = RuntimeError("caching not available")
+    config = manager.config_for(FakeClient(caches), "key", MODEL, INSTRUCTION)
+    assert config.cached_content is None
+    assert config.system_instruction == INSTRUCTION
+
+
+def test_concurrent_first_requests_create_one_cache():
+    clock = FakeClock()
+    clock.now = time.time()
+    caches = FakeCaches(clock, create_delay=0.2)
+    manager = _manager()
+    names = []
+
+    def request():
+        names.append(manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(caches.created) == 1
+    assert names == ["cachedContents/1"] * 8
+
+
+def test_short_instruction_is_never_sent_to_create(clock):
+    caches = FakeCaches(clock)
+    manager = _manager()
+
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, "Be brief.") is None
+    assert caches.created == []
+
+
+def test_invalid_argument_from_create_is_not_retried(clock):
+    caches = FakeCaches(clock, fail=APIError(400, {"error": {"status": "INVALID_ARGUMENT"}}))
+    manager = _manager()
+
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION) is None
+    caches.fail = None
+    clock.now += 24 * 60 * 60
+    assert manager.cached_content_name(FakeClient(caches), "key", MODEL, INSTRUCTION) is None
+    assert caches.created == []
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("google.genai")
+
+import conversation_manager as cm
+
+
+def _exchanges(count, chars):
+    messages = []
+    for _ in range(count):
+        messages.append({"role": "user", "text": "q" * chars})
+        messages.append({"role": "model", "text": "a" * chars})
+    return messages
+
+
+def test_recent_turns_over_budget_do_not_fold_every_turn():
+    # Four kept exchanges of ~1500 tokens each are over a 2000 token budget on their own.
+    messages = _exchanges(5, 3000)
+    assert cm.messages_to_fold(messages, 0, keep_turns=4, token_budget=2000) == []
+
+
+def test_older_messages_fold_in_one_batch_once_over_budget():
+    messages = _exchanges(8, 4000)
+    to_fold = cm.messages_to_fold(messages, 0, keep_turns=4, token_budget=2000)
+    assert to_fold == messages[:8]
+    assert cm.messages_to_fold(messages, len(to_fold), keep_turns=4, token_budget=2000, summary="notes") == []
@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+fpdf = pytest.importorskip("fpdf")
+
+import document_manager as dm
+
+
+def _pdf(page_count):
+    pdf = fpdf.FPDF()
+    pdf.set_font("Helvetica", size=12)
+    for number in range(page_count):
+        pdf.add_page()
+        pdf.cell(0, 10, f"Page {number + 1} text")
+    return pdf.output(dest="S").encode("latin-1")
+
+
+def _temp_pdfs():
+    return {name for name in os.listdir(tempfile.gettempdir()) if name.endswith(".pdf")}
+
+
+def test_parallel_extraction_matches_serial_and_cleans_up():
+    data = _pdf(dm.PARALLEL_MIN_PAGES + 5)
+    before = _temp_pdfs()
+
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        parallel = dm.extract_document(data, "notes.pdf", pool, workers=2)
+        capped = dm.extract_document(data, "notes.pdf", pool, workers=2, max_chars=50)
+    serial = dm.extract_document(data, "notes.pdf")
+
+    assert parallel["pages"] == serial["pages"]
+    assert capped["metadata"]["truncated"]
+    assert _temp_pdfs() == before
+
+
+def test_iter_pages_reads_pages_only_when_asked(monkeypatch):
+    from pypdf import PageObject
+
+    extracted = []
+    extract_text = PageObject.extract_text
+    monkeypatch.setattr(PageObject, "extract_text",
+                        lambda page, *args, **kwargs: extracted.append(page) or extract_text(page, *args, **kwargs))
+
+    pages = dm.iter_pages(_pdf(5), "notes.pdf", page_range=(1, 4))
+    first = next(pages)
+
+    assert first == {"number": 2, "text": "Page 2 text", "chars": len("Page 2 text")}
+    assert len(extracted) == 1
+    assert [page["number"] for page in pages] == [3, 4]
+
+
+def test_iter_pages_stops_at_the_character_cap():
+    pages = list(dm.iter_pages(_pdf(5), "notes.pdf", max_chars=25))
+
+    assert [page["number"] for page in pages] == [1, 2, 3]
+    assert [page["chars"] for page in pages] == [11, 11, 3]
+    assert "".join(page["text"] for page in pages) == "Page 1 textPage 2 textPag"
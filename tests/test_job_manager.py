@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import job_manager as jm
+
+
+def _crash():
+    os._exit(1)
+
+
+def _pid():
+    return os.getpid()
+
+
+def _make_pool():
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+
+def test_pool_holder_rebuilds_broken_pool_and_retries_once():
+    holder = jm.ProcessPoolHolder(_make_pool)
+    first_pool = holder.get()
+    calls = []
+
+    def work(pool):
+        calls.append(pool)
+        if len(calls) == 1:
+            return pool.submit(_crash).result()
+        return pool.submit(_pid).result()
+
+    assert holder.run(work) > 0
+    assert calls[0] is first_pool
+    assert calls[1] is not first_pool
+    assert holder.get() is calls[1]
+    holder.get().shutdown()
+
+
+def test_pool_holder_discard_ignores_stale_pool():
+    holder = jm.ProcessPoolHolder(_make_pool)
+    stale = holder.get()
+    holder.discard(stale)
+    current = holder.get()
+
+    holder.discard(stale)
+
+    assert holder.get() is current
+    current.shutdown()
+
+
+def _failing_init():
+    raise RuntimeError("model download failed")
+
+
+def test_failed_prewarm_discards_broken_pool():
+    import time
+
+    import transcription_manager as tm
+
+    holder = jm.ProcessPoolHolder(lambda: ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn"), initializer=_failing_init,
+    ))
+    broken = holder.get()
+    prewarm = tm.PoolPrewarm(holder, 1)
+    deadline = time.time() + 60
+    while prewarm.status == prewarm.WARMING and time.time() < deadline:
+        time.sleep(0.1)
+
+    assert prewarm.status == prewarm.FAILED
+    assert holder.get() is not broken
+    holder.get().shutdown()
+
+
+def test_get_only_returns_jobs_to_their_owner():
+    manager = jm.JobManager({"tts": 1})
+    job_id = manager.submit("tts", "lecture.mp3", "session:a", lambda job: "audio")
+
+    assert manager.get(job_id, "session:a").label == "lecture.mp3"
+    assert manager.get(job_id, "session:b") is None
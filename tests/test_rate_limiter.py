@@ -0,0 +1,67 @@
+import threading
+import time
+
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitExceeded
+
+
+def test_burst_then_refill():
+    limiter = RateLimiter(capacity=3, refill_per_second=10)
+
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire("key", max_wait=1)
+    assert time.monotonic() - start < 0.05
+
+    assert 0.05 < limiter.estimate_wait("key") <= 0.1
+    limiter.acquire("key", max_wait=1)
+    assert 0.07 < time.monotonic() - start < 0.5
+
+
+def test_waiters_are_served_in_arrival_order():
+    limiter = RateLimiter(capacity=1, refill_per_second=20)
+    limiter.acquire("key")
+    served = []
+
+    def wait_for_token(number):
+        limiter.acquire("key", max_wait=5)
+        served.append(number)
+
+    threads = []
+    for number in range(5):
+        thread = threading.Thread(target=wait_for_token, args=(number,))
+        thread.start()
+        threads.append(thread)
+        # Let this thread join the queue before the next one arrives.
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert served == list(range(5))
+
+
+def test_raises_when_max_wait_is_too_short():
+    limiter = RateLimiter(capacity=1, refill_per_second=1 / 60)
+    limiter.acquire("key")
+
+    start = time.monotonic()
+    with pytest.raises(RateLimitExceeded) as exc_info:
+        limiter.acquire("key", max_wait=0.1)
+    assert time.monotonic() - start < 0.1
+    assert 55 < exc_info.value.wait_seconds <= 60
+    # Other keys have buckets of their own.
+    limiter.acquire("other", max_wait=0)
+
+
+def test_db_path_shares_the_bucket_between_limiters(tmp_path):
+    db_path = str(tmp_path / "limits" / "rate.sqlite")
+    first = RateLimiter(capacity=2, refill_per_second=1 / 60, db_path=db_path)
+    second = RateLimiter(capacity=2, refill_per_second=1 / 60, db_path=db_path)
+
+    first.acquire("key")
+    second.acquire("key")
+
+    assert first.estimate_wait("key") > 55
+    with pytest.raises(RateLimitExceeded):
+        second.acquire("key", max_wait=0.1)
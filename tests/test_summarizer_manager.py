@@ -0,0 +1,69 @@
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from sumy.parsers.plaintext import PlaintextParser
+
+import summarizer_manager as sm
+
+
+class SimpleTokenizer:
+    # Stands in for sumy's NLTK tokenizer so these tests run without the punkt data.
+
+    language = "english"
+
+    def to_sentences(self, paragraph):
+        return [sentence for sentence in re.split(r"(?<=[.!?])\s+", paragraph.strip()) if sentence]
+
+    def to_words(self, sentence):
+        return re.findall(r"[A-Za-z']+", sentence)
+
+
+def parse_document(text):
+    return PlaintextParser.from_string(text, SimpleTokenizer()).document
+
+
+WORDS = ("cell membrane protein energy enzyme gene cycle nucleus transport signal pathway structure "
+         "function molecule receptor channel gradient ion water lipid").split()
+
+
+def _random_text(rng, sentence_count):
+    # A small vocabulary and one-word sentences exercise overlapping sentences, ties and zero denominators.
+    sentences = []
+    for _ in range(sentence_count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(1, 12))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return "\n\n".join(" ".join(sentences[start:start + 5]) for start in range(0, len(sentences), 5))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_engine_matches_sumy(seed):
+    rng = random.Random(seed)
+    document = parse_document(_random_text(rng, rng.randint(5, 150)))
+    count = rng.randint(1, 20)
+
+    assert sm.load_summarizer("numpy")(document, count) == sm.load_summarizer("sumy")(document, count)
+
+
+def test_chunks_follow_page_boundaries():
+    pages = [f"Page {number} starts here and runs on\nacross lines of the page." for number in range(30)]
+
+    chunks = list(sm.chunk_sections(pages, max_chars=200))
+
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert [page for chunk in chunks for page in chunk.split("\n\n")] == pages
+
+
+def test_summarize_hierarchical_returns_key_points(monkeypatch):
+    monkeypatch.setattr(sm, "parse_document", parse_document)
+    pages = [" ".join(f"Sentence {number} on page {page} about cell membranes and their proteins."
+                      for number in range(40)) for page in range(12)]
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        key_points = sm.summarize_hierarchical(pages, pool, workers=2, key_points=8, chunk_chars=2000)
+
+    assert len(key_points) == 8
+    text = "\n\n".join(pages)
+    assert all(str(sentence) in text for sentence in key_points)
@@ -0,0 +1,124 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import job_manager as jm
+import tts_manager
+
+
+class TaggedBackend(tts_manager.FakeBackend):
+    # Silent audio preceded by the chunk text, so the joined MP3 shows the order chunks were put in.
+    # Earlier chunks take longer, so they finish out of order.
+
+    def synthesize(self, text):
+        time.sleep(0.05 / len(text))
+        return text.encode("utf-8") + super().synthesize(text)
+
+
+class FailingBackend(tts_manager.FakeBackend):
+
+    def __init__(self):
+        super().__init__(delay_seconds=0.1)
+        self.calls = []
+
+    def synthesize(self, text):
+        self.calls.append(text)
+        if text == "bad":
+            raise RuntimeError("TTS service unavailable")
+        return super().synthesize(text)
+
+
+def test_split_text_keeps_order_around_run_on_sentence():
+    run_on = " ".join(f"word{i}" for i in range(400))
+    text = f"Short intro sentence here. {run_on}. Final sentence."
+
+    chunks = tts_manager.split_text(text)
+
+    assert all(len(chunk) <= tts_manager.MAX_CHUNK_CHARS for chunk in chunks)
+    assert " ".join(chunks) == " ".join(text.split())
+    assert chunks[0].startswith("Short intro sentence here.")
+
+
+def test_split_text_keeps_order_of_bullet_notes():
+    bullets = "\n".join(f"- point {i} about the structure of the cell membrane and its proteins" for i in range(60))
+    text = f"Intro. This lecture covers cells.\n{bullets}"
+
+    chunks = tts_manager.split_text(text)
+
+    assert " ".join(chunks) == " ".join(text.split())
+    assert chunks[0].startswith("Intro. This lecture covers cells.")
+
+
+def test_synthesize_chunks_joins_audio_in_chunk_order():
+    backend = TaggedBackend()
+    chunks = ["first.", "second chunk.", "the third chunk."]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        audio = tts_manager.synthesize_chunks(pool, backend, chunks)
+
+    assert audio == b"".join(backend.synthesize(chunk) for chunk in chunks)
+
+
+def test_run_tts_job_returns_audio_for_every_chunk():
+    backend = tts_manager.FakeBackend()
+    text = "\n\n".join(f"Paragraph {i} of the lecture." for i in range(6))
+    chunks = tts_manager.split_text(text)
+    job = jm.Job("tts", "lecture.mp3", "session:test")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        audio = tts_manager.run_tts_job(job, pool, backend, text)
+
+    frames = sum(max(1, len(chunk) * 3) for chunk in chunks)
+    assert len(chunks) == 6
+    assert len(audio) == frames * len(tts_manager.FakeBackend.SILENT_FRAME)
+    assert job.message == f"Generated {len(chunks)} of {len(chunks)} parts"
+
+
+def test_failing_chunk_cancels_remaining_chunks(monkeypatch):
+    monkeypatch.setattr(tts_manager.random, "uniform", lambda low, high: 0.0)
+    backend = FailingBackend()
+    chunks = ["bad", "two", "three", "four", "five"]
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(RuntimeError):
+            tts_manager.synthesize_chunks(pool, backend, chunks)
+
+    # The chunk already running may finish; the ones still queued are never sent.
+    assert backend.calls[:tts_manager.CHUNK_ATTEMPTS] == ["bad"] * tts_manager.CHUNK_ATTEMPTS
+    assert not {"three", "four", "five"} & set(backend.calls)
+
+
+def test_progressive_audio_groups_parts_and_releases_them_in_order():
+    backend = tts_manager.FakeBackend()
+    chunks = [f"Chunk number {i}." for i in range(10)]
+    audio = [backend.synthesize(chunk) for chunk in chunks]
+    progressive = tts_manager.ProgressiveAudio(len(chunks))
+
+    assert progressive.parts == [(0, 1), (1, 3), (3, 7), (7, 10)]
+
+    # Later chunks finish first: nothing is released until the first part is complete.
+    for index in (9, 8, 7, 2):
+        progressive.add(index, audio[index])
+    assert progressive.ready_parts() == []
+
+    progressive.add(0, audio[0])
+    progressive.add(1, audio[1])
+    assert progressive.ready_parts() == [audio[0], audio[1] + audio[2]]
+
+    for index in (6, 5, 4, 3):
+        progressive.add(index, audio[index])
+    assert len(progressive.ready_parts()) == 4
+    assert b"".join(progressive.ready_parts()) == tts_manager.join_mp3(audio)
+
+
+def test_run_tts_job_parts_add_up_to_the_full_mp3():
+    backend = TaggedBackend()
+    text = "\n\n".join(f"Paragraph {i}." + " padding" * i for i in range(7))
+    job = jm.Job("tts", "lecture.mp3", "session:test")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        audio = tts_manager.run_tts_job(job, pool, backend, text, progressive=True)
+
+    assert len(job.partial.parts) == 3
+    assert b"".join(job.partial.ready_parts()) == audio
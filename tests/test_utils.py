@@ -0,0 +1,85 @@
+import json
+import logging
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+import utils
+
+
+def test_info_logs_are_emitted():
+    assert utils.logger.isEnabledFor(logging.INFO)
+    assert utils.logger.handlers
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    breaker = utils.CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    monkeypatch.setattr(utils, "get_circuit_breaker", lambda model: breaker)
+    monkeypatch.setattr(utils.time, "sleep", lambda seconds: None)
+    return breaker
+
+
+def _raise(error):
+    def send(timeout):
+        raise error
+    return send
+
+
+def test_local_rate_limit_on_probe_keeps_circuit_open(breaker):
+    breaker.record_failure()
+
+    with pytest.raises(utils.RateLimitExceeded):
+        utils._call_with_retries("Quiz Generator", "model", _raise(utils.RateLimitExceeded(5)))
+
+    assert breaker._opened_at is not None
+    # The trial slot is free again, so the next request can probe.
+    assert breaker.allow_request()
+
+
+def test_api_error_on_probe_closes_circuit(breaker):
+    breaker.record_failure()
+
+    with pytest.raises(utils.APIError):
+        utils._call_with_retries("Quiz Generator", "model", _raise(utils.APIError(400, {"error": {}})))
+
+    assert breaker._opened_at is None
+
+
+def test_final_transport_error_is_reported_as_unavailable(monkeypatch):
+    monkeypatch.setattr(utils, "get_circuit_breaker", lambda model: utils.CircuitBreaker(failure_threshold=100))
+    monkeypatch.setattr(utils.time, "sleep", lambda seconds: None)
+
+    with pytest.raises(utils.GeminiUnavailable):
+        utils._call_with_retries("Quiz Generator", "model", _raise(utils.httpx.ConnectError("connection refused")))
+
+
+def _question(number):
+    return {"question": f"Question {number}?", "options": ["A", "B", "C", "D"], "answer": "B",
+            "explanation": "Because."}
+
+
+def test_parse_questions_accepts_fenced_output():
+    text = "```json\n" + json.dumps([_question(1), _question(2)]) + "\n```"
+    assert utils.parse_questions(text) == [_question(1), _question(2)]
+
+
+def test_parse_questions_keeps_questions_before_truncation():
+    text = json.dumps([_question(1), _question(2)])[:-40]
+    assert utils.parse_questions(text) == [_question(1)]
+
+
+def test_parse_questions_drops_answer_not_in_options():
+    wrong = dict(_question(2), answer="E")
+    assert utils.parse_questions(json.dumps([_question(1), wrong, _question(3)])) == [_question(1), _question(3)]
+
+
+def test_parse_questions_skips_malformed_middle_item():
+    text = f'[{json.dumps(_question(1))}, {{"question": 1 2}}, {json.dumps(_question(3))}]'
+    assert utils.parse_questions(text) == [_question(1), _question(3)]
+
+
+def test_parse_questions_rejects_output_without_valid_questions():
+    with pytest.raises(ValueError):
+        utils.parse_questions('{"not": "a list"}')
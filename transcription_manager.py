@@ -0,0 +1,407 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import as_completed
+
+import numpy as np
+
+logger = logging.getLogger("logeekmind")
+
+SAMPLE_RATE = 16000
+
+FRAME_SECONDS = 0.03
+TARGET_SEGMENT_SECONDS = 60
+MAX_SEGMENT_SECONDS = 120
+MIN_SILENCE_SECONDS = 0.3
+
+MODEL_SIZES = ["tiny", "base", "small"]
+
+PREWARM_TIMEOUT_SECONDS = 15 * 60
+
+_worker_engine = None
+
+
+class WhisperEngine:
+    # Reference engine: openai-whisper on PyTorch, FP32 on CPU.
+
+    name = "whisper"
+
+    def __init__(self, model_size="base", threads=0):
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.model_size = model_size
+        self.model = whisper.load_model(model_size)
+
+    @classmethod
+    def make_id(cls, model_size):
+        return f"{cls.name}:{model_size}"
+
+    @property
+    def engine_id(self):
+        return self.make_id(self.model_size)
+
+    def transcribe(self, audio):
+        result = self.model.transcribe(audio, fp16=False)
+        return {
+            "text": result["text"].strip(),
+            "segments": [
+                {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                for segment in result["segments"]
+            ],
+        }
+
+
+class FasterWhisperEngine:
+    # CTranslate2 port of Whisper with int8-quantized weights; several times faster on CPU.
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size="base", threads=0, compute_type="int8"):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("The faster-whisper engine requires the 'faster-whisper' package.") from e
+
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+    @classmethod
+    def make_id(cls, model_size, compute_type="int8"):
+        return f"{cls.name}:{model_size}:{compute_type}"
+
+    @property
+    def engine_id(self):
+        return self.make_id(self.model_size, self.compute_type)
+
+    def transcribe(self, audio):
+        segments, _ = self.model.transcribe(audio, beam_size=5)
+        segments = [
+            {"start": segment.start, "end": segment.end, "text": segment.text}
+            for segment in segments
+        ]
+        return {"text": "".join(segment["text"] for segment in segments).strip(), "segments": segments}
+
+
+ENGINES = {
+    WhisperEngine.name: WhisperEngine,
+    FasterWhisperEngine.name: FasterWhisperEngine,
+}
+
+
+def load_engine(engine_name="whisper", model_size="base", threads=0):
+    if engine_name not in ENGINES:
+        raise ValueError(f"Unknown ASR engine '{engine_name}'. Choose one of: {', '.join(ENGINES)}")
+    if model_size not in MODEL_SIZES:
+        raise ValueError(f"Unsupported model size '{model_size}'. Choose one of: {', '.join(MODEL_SIZES)}")
+    return ENGINES[engine_name](model_size, threads)
+
+
+def _ffmpeg_decode(source, data=None):
+    # Decodes to mono 16 kHz float32, the same format whisper.load_audio produces, without importing torch.
+    command = ["ffmpeg", "-nostdin", "-threads", "0", "-i", source,
+               "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-"]
+    if data is not None:
+        command.remove("-nostdin")
+    try:
+        output = subprocess.run(command, input=data, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to decode audio: {e.stderr.decode(errors='ignore')}") from e
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+def engine_id(engine_name, model_size):
+    return ENGINES[engine_name].make_id(model_size)
+
+
+def decode_audio_file(path):
+    return _ffmpeg_decode(path)
+
+
+def decode_audio_bytes(data, suffix=""):
+    try:
+        audio = _ffmpeg_decode("pipe:0", data)
+        if len(audio):
+            return audio
+    except RuntimeError:
+        pass
+
+    # MP4/M4A files that keep their index at the end of the file cannot be demuxed from a pipe;
+    # those alone go through a temporary file, which is removed as soon as it is decoded.
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        return _ffmpeg_decode(tmp.name)
+
+
+def audio_fingerprint(audio):
+    return hashlib.sha256(np.ascontiguousarray(audio).tobytes()).hexdigest()
+
+
+def transcript_size(result):
+    return len(result["text"].encode("utf-8")) + sum(len(segment["text"].encode("utf-8")) + 64
+                                                     for segment in result["segments"])
+
+
+def find_silences(audio, min_silence_seconds=MIN_SILENCE_SECONDS):
+    # Energy-based voice activity detection: frames well below the recording's typical
+    # loudness are treated as silence. Returns (start, end) sample ranges of silent runs.
+    frame_length = int(SAMPLE_RATE * FRAME_SECONDS)
+    frame_count = len(audio) // frame_length
+    if frame_count == 0:
+        return []
+
+    frames = audio[:frame_count * frame_length].reshape(frame_count, frame_length)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    threshold = max(min(np.percentile(energy, 10) * 2, np.median(energy) * 0.5), 1e-4)
+    silent = energy < threshold
+
+    # Edges of runs of silent frames.
+    padded = np.concatenate(([False], silent, [False]))
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    starts, ends = changes[0::2], changes[1::2]
+
+    min_frames = int(min_silence_seconds / FRAME_SECONDS)
+    return [
+        (int(start) * frame_length, int(end) * frame_length)
+        for start, end in zip(starts, ends)
+        if end - start >= min_frames
+    ]
+
+
+def split_on_silence(audio, target_seconds=TARGET_SEGMENT_SECONDS, max_seconds=MAX_SEGMENT_SECONDS):
+    # Cuts the recording into roughly `target_seconds` pieces, preferring the middle of a pause
+    # so no word is split; falls back to a hard cut at `max_seconds` during continuous speech.
+    total = len(audio)
+    target = int(target_seconds * SAMPLE_RATE)
+    limit = int(max_seconds * SAMPLE_RATE)
+    cut_points = [(start + end) // 2 for start, end in find_silences(audio)]
+
+    segments = []
+    segment_start = 0
+    candidate = 0
+    while total - segment_start > limit:
+        while candidate < len(cut_points) and cut_points[candidate] - segment_start < target:
+            candidate += 1
+
+        if candidate < len(cut_points) and cut_points[candidate] - segment_start <= limit:
+            segment_end = cut_points[candidate]
+        else:
+            segment_end = segment_start + limit
+
+        segments.append((segment_start, segment_end))
+        segment_start = segment_end
+
+    segments.append((segment_start, total))
+    return segments
+
+
+def _init_worker(engine_name, model_size, threads):
+    global _worker_engine
+    _worker_engine = load_engine(engine_name, model_size, threads)
+
+
+def _warm_up_worker(hold_seconds=0.0):
+    # The initializer has already loaded the model by the time this runs; holding the worker
+    # briefly makes the pool hand the next warm-up task to a process that is still starting.
+    time.sleep(hold_seconds)
+    return os.getpid()
+
+
+def _transcribe_segment(index, offset_seconds, audio_segment):
+    result = _worker_engine.transcribe(audio_segment)
+    segments = [
+        {"start": segment["start"] + offset_seconds, "end": segment["end"] + offset_seconds, "text": segment["text"]}
+        for segment in result["segments"]
+    ]
+    return index, result["text"], segments
+
+
+def create_transcription_pool(engine_name, model_size, workers):
+    # Imported here: pool workers import this module, and job_manager would pull Streamlit into each of them.
+    from job_manager import create_process_pool
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    return create_process_pool(workers, _init_worker, (engine_name, model_size, threads))
+
+
+class PoolPrewarm:
+    # Starts every worker of a transcription pool in the background so the model download,
+    # the torch import and the weight loading happen before the first upload, not during it.
+
+    WARMING = "warming"
+    READY = "ready"
+    FAILED = "failed"
+
+    def __init__(self, pools, workers):
+        self.pools = pools
+        self.workers = workers
+        self.status = self.WARMING
+        self.error = None
+        self.started_at = time.time()
+        self.ready_at = None
+        self._thread = threading.Thread(target=self._run, name="transcription-prewarm", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        pool = self.pools.get()
+        try:
+            # One worker first, so only one process downloads the model weights into the shared cache.
+            warmed = {pool.submit(_warm_up_worker).result()}
+            # The pool only starts another process when no worker is idle, so keep every worker busy
+            # until each one has answered.
+            deadline = time.time() + PREWARM_TIMEOUT_SECONDS
+            while len(warmed) < self.workers and time.time() < deadline:
+                futures = [pool.submit(_warm_up_worker, 0.5) for _ in range(self.workers)]
+                warmed.update(future.result() for future in futures)
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+            self.status = self.FAILED
+            logger.warning("Transcription model prewarm failed: %s", self.error)
+            # The failure came from the worker initializer, which leaves the pool broken; the next
+            # conversion starts a fresh one (and loads the model again) instead of reusing it.
+            self.pools.discard(pool)
+            return
+        self.ready_at = time.time()
+        self.status = self.READY
+        logger.info("Transcription pool warmed up in %.1fs (%d workers)", self.ready_at - self.started_at, self.workers)
+
+    @property
+    def ready(self):
+        return self.status == self.READY
+
+
+def format_timestamp(seconds, decimal_marker=","):
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+class TranscriptWriter:
+    # Builds the plain text, SRT, VTT and JSON renderings side by side as pieces arrive,
+    # so partial output can be shown and downloaded at any point without re-walking the result.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._texts = []
+        self._segments = []
+        self._srt = []
+        self._vtt = ["WEBVTT\n\n"]
+        self._json = []
+
+    @classmethod
+    def from_result(cls, result):
+        writer = cls()
+        writer.add(result["text"], result["segments"])
+        return writer
+
+    def add(self, text, segments):
+        with self._lock:
+            if text.strip():
+                self._texts.append(text.strip())
+            for segment in segments:
+                caption = segment["text"].strip()
+                if not caption:
+                    continue
+                self._segments.append(segment)
+                self._srt.append(f"{len(self._segments)}\n{format_timestamp(segment['start'])} --> "
+                                 f"{format_timestamp(segment['end'])}\n{caption}\n\n")
+                self._vtt.append(f"{format_timestamp(segment['start'], '.')} --> "
+                                 f"{format_timestamp(segment['end'], '.')}\n{caption}\n\n")
+                self._json.append(json.dumps(
+                    {"start": round(segment["start"], 3), "end": round(segment["end"], 3), "text": caption},
+                    ensure_ascii=False,
+                ))
+
+    @property
+    def text(self):
+        with self._lock:
+            return " ".join(self._texts)
+
+    @property
+    def segment_count(self):
+        return len(self._segments)
+
+    def to_srt(self):
+        with self._lock:
+            return "".join(self._srt)
+
+    def to_vtt(self):
+        with self._lock:
+            return "".join(self._vtt)
+
+    def to_json(self):
+        with self._lock:
+            text = json.dumps(" ".join(self._texts), ensure_ascii=False)
+            return f'{{"text": {text}, "segments": [\n' + ",\n".join(self._json) + "\n]}\n"
+
+    def result(self):
+        with self._lock:
+            return {"text": " ".join(self._texts), "segments": list(self._segments)}
+
+
+def transcribe_parallel(pool, audio, on_progress=None, on_ready=None):
+    boundaries = split_on_silence(audio)
+    futures = [
+        pool.submit(_transcribe_segment, index, start / SAMPLE_RATE, audio[start:end])
+        for index, (start, end) in enumerate(boundaries)
+    ]
+
+    results = [None] * len(futures)
+    next_ready = 0
+    for completed, future in enumerate(as_completed(futures), start=1):
+        index, text, segments = future.result()
+        results[index] = (text, segments)
+        # Pieces are handed on in order, as soon as everything before them has finished.
+        while next_ready < len(results) and results[next_ready] is not None:
+            if on_ready is not None:
+                on_ready(*results[next_ready])
+            next_ready += 1
+        if on_progress is not None:
+            on_progress(completed, len(futures))
+
+    return {
+        "text": " ".join(text for text, _ in results if text),
+        "segments": [segment for _, segments in results for segment in segments],
+    }
+
+
+def run_transcription_job(job, pools, transcript_cache, engine_key, audio_bytes, suffix=""):
+    # Runs on a job worker thread: reports progress through `job` and never touches Streamlit.
+    job.update(0.0, "Decoding audio...")
+    audio = decode_audio_bytes(audio_bytes, suffix)
+
+    cache_key = f"{engine_key}:{audio_fingerprint(audio)}"
+    result = transcript_cache.get(cache_key)
+    logger.info("Transcript cache %s (hit rate %.0f%%)", "hit" if result is not None else "miss",
+                transcript_cache.stats()["hit_rate"] * 100)
+    if result is not None:
+        return TranscriptWriter.from_result(result)
+
+    def transcribe(pool):
+        # A fresh writer per attempt, so a retry on a rebuilt pool doesn't repeat segments.
+        writer = TranscriptWriter()
+        job.partial = writer
+        job.update(0.0, "Transcribing lecture segments...")
+        transcribe_parallel(
+            pool, audio,
+            on_progress=lambda completed, total: job.update(
+                completed / total, f"Transcribed {completed} of {total} segments"
+            ),
+            on_ready=writer.add,
+        )
+        return writer
+
+    writer = pools.run(transcribe)
+    transcript_cache.put(cache_key, writer.result())
+    return writer
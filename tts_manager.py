@@ -0,0 +1,298 @@
+import hashlib
+import io
+import logging
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("logeekmind")
+
+# gTTS already cuts its input into ~100 character requests and sends them one after another;
+# chunks this size keep each job to a handful of those while leaving plenty to run side by side.
+MAX_CHUNK_CHARS = 1500
+MIN_CHUNK_CHARS = 300
+CHUNK_ATTEMPTS = 3
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+class GTTSBackend:
+    # Google Translate's TTS endpoint; needs network access but no local models.
+
+    name = "gtts"
+
+    def __init__(self, lang="en", tld="com"):
+        self.lang = lang
+        self.tld = tld
+
+    @property
+    def voice_id(self):
+        return f"{self.name}:{self.lang}:{self.tld}"
+
+    def synthesize(self, text):
+        from gtts import gTTS
+
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=self.lang, tld=self.tld).write_to_fp(buffer)
+        return buffer.getvalue()
+
+
+class Pyttsx3Backend:
+    # Offline engine (eSpeak/SAPI5/NSSpeechSynthesizer through pyttsx3); output is encoded to MP3 with ffmpeg.
+
+    name = "pyttsx3"
+
+    def __init__(self, lang="en", rate=170):
+        try:
+            import pyttsx3
+        except ImportError as e:
+            raise RuntimeError("The pyttsx3 TTS backend requires the 'pyttsx3' package.") from e
+
+        self.lang = lang
+        self.rate = rate
+        self._engine = pyttsx3.init()
+        self._engine.setProperty("rate", rate)
+        # The driver loop is not re-entrant, so chunks are rendered one at a time; encoding still overlaps.
+        self._lock = threading.Lock()
+
+    @property
+    def voice_id(self):
+        return f"{self.name}:{self.lang}:{self.rate}"
+
+    def synthesize(self, text):
+        with tempfile.NamedTemporaryFile(suffix=".wav") as tmp:
+            with self._lock:
+                self._engine.save_to_file(text, tmp.name)
+                self._engine.runAndWait()
+            return _encode_mp3(tmp.name)
+
+
+class FakeBackend:
+    # Deterministic silent audio with an optional artificial delay; for local development and tests.
+
+    name = "fake"
+
+    # One MPEG-2 Layer III frame, 24 kHz mono at 32 kbps (the format gTTS returns), with empty audio data.
+    SILENT_FRAME = b"\xff\xf3\x44\xc0" + bytes(92)
+
+    def __init__(self, lang="en", delay_seconds=0.0):
+        self.lang = lang
+        self.delay_seconds = delay_seconds
+
+    @property
+    def voice_id(self):
+        return f"{self.name}:{self.lang}"
+
+    def synthesize(self, text):
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        # Roughly a spoken second per 15 characters; a frame holds 24 ms.
+        return self.SILENT_FRAME * max(1, len(text) * 3)
+
+
+BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    Pyttsx3Backend.name: Pyttsx3Backend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def load_backend(backend_name="gtts", lang="en"):
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend '{backend_name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[backend_name](lang)
+
+
+def _encode_mp3(path):
+    # Same stream parameters as gTTS output so chunks from either backend join cleanly; no Xing header,
+    # which would otherwise tell players the whole file is as long as its first chunk.
+    command = ["ffmpeg", "-nostdin", "-i", path, "-f", "mp3", "-codec:a", "libmp3lame",
+               "-ar", "24000", "-ac", "1", "-b:a", "32k", "-write_xing", "0", "-"]
+    try:
+        return subprocess.run(command, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to encode audio: {e.stderr.decode(errors='ignore')}") from e
+
+
+def _split_long(text, max_chars, min_chars=MIN_CHUNK_CHARS):
+    # Pieces end after sentences picked by a hash of their own text rather than by position, so an
+    # edit early in a long paragraph only changes the piece it falls in and the later pieces still
+    # match what is cached.
+    pieces = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        # A single run-on "sentence" longer than a chunk is cut at the last space that fits,
+        # after whatever is already buffered so the reading order is kept.
+        if len(sentence) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+
+        if len(current) >= min_chars and zlib.crc32(sentence.encode("utf-8")) % 4 == 0:
+            pieces.append(current)
+            current = ""
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, max_chars=MAX_CHUNK_CHARS):
+    # Every paragraph is its own chunk (long ones are split further), so editing one paragraph
+    # leaves the others byte-for-byte identical and they are reused from the cache.
+    chunks = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) > max_chars:
+            chunks.extend(_split_long(paragraph, max_chars))
+        else:
+            chunks.append(paragraph)
+    return chunks
+
+
+def chunk_cache_key(backend, text):
+    normalized = unicodedata.normalize("NFC", " ".join(text.split()))
+    return hashlib.sha256(f"{backend.voice_id}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+def strip_id3(data):
+    # MP3 frames can be concatenated as-is, but per-file ID3 tags would end up in the middle of the stream.
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        data = data[10 + size:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+def join_mp3(chunks):
+    return b"".join(strip_id3(chunk) for chunk in chunks)
+
+
+def synthesize_chunk(backend, text):
+    for attempt in range(CHUNK_ATTEMPTS):
+        try:
+            return backend.synthesize(text)
+        except Exception as e:
+            if attempt == CHUNK_ATTEMPTS - 1:
+                raise
+            delay = random.uniform(0, 2 ** attempt)
+            logger.warning("TTS chunk failed (%s); retrying in %.1fs", e, delay)
+            time.sleep(delay)
+
+
+def create_tts_pool(workers=4):
+    return ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="tts-chunk")
+
+
+class ProgressiveAudio:
+    # Groups chunks into parts of 1, 2, 4, 8... chunks: the first part is playable after a single
+    # chunk, and a long lecture still ends up as only a handful of players.
+
+    def __init__(self, chunk_count):
+        self.chunk_count = chunk_count
+        self.parts = []
+        start, size = 0, 1
+        while start < chunk_count:
+            self.parts.append((start, min(start + size, chunk_count)))
+            start += size
+            size *= 2
+
+        self._chunks = [None] * chunk_count
+        self._joined = []
+        self._lock = threading.Lock()
+
+    def add(self, index, data):
+        with self._lock:
+            self._chunks[index] = data
+            # Parts become available strictly in order, once every chunk in them is done.
+            while len(self._joined) < len(self.parts):
+                start, end = self.parts[len(self._joined)]
+                if any(chunk is None for chunk in self._chunks[start:end]):
+                    break
+                self._joined.append(join_mp3(self._chunks[start:end]))
+
+    def ready_parts(self):
+        with self._lock:
+            return list(self._joined)
+
+
+def synthesize_chunks(pool, backend, chunks, on_progress=None, cache=None, on_chunk=None):
+    keys = [chunk_cache_key(backend, chunk) for chunk in chunks]
+    audio = [cache.get(key) if cache is not None else None for key in keys]
+    futures = {
+        index: pool.submit(synthesize_chunk, backend, chunk)
+        for index, chunk in enumerate(chunks) if audio[index] is None
+    }
+    logger.info("TTS chunks: %d cached, %d to synthesize", len(chunks) - len(futures), len(futures))
+
+    if on_chunk is not None:
+        for index, data in enumerate(audio):
+            if data is not None:
+                on_chunk(index, data)
+
+    try:
+        for completed, index in enumerate(futures, start=1):
+            audio[index] = futures[index].result()
+            if cache is not None:
+                cache.put(keys[index], audio[index])
+            if on_chunk is not None:
+                on_chunk(index, audio[index])
+            if on_progress is not None:
+                on_progress(completed, len(futures))
+    except Exception:
+        # The pool is shared with other jobs; don't leave it busy with parts nobody will collect.
+        for future in futures.values():
+            future.cancel()
+        raise
+    return join_mp3(audio)
+
+
+def synthesize(pool, backend, text, **kwargs):
+    chunks = split_text(text)
+    if not chunks:
+        raise ValueError("There is no text to convert.")
+    return synthesize_chunks(pool, backend, chunks, **kwargs)
+
+
+def run_tts_job(job, pool, backend, text, cache=None, progressive=False):
+    # Runs on a job worker thread: reports progress through `job` and never touches Streamlit.
+    chunks = split_text(text)
+    if not chunks:
+        raise ValueError("There is no text to convert.")
+
+    on_chunk = None
+    if progressive:
+        job.partial = ProgressiveAudio(len(chunks))
+        on_chunk = job.partial.add
+
+    job.update(0.0, "Generating audio…")
+    started = time.time()
+    audio = synthesize_chunks(
+        pool, backend, chunks,
+        on_progress=lambda completed, total: job.update(
+            completed / total, f"Generated {completed} of {total} parts"
+        ),
+        cache=cache,
+        on_chunk=on_chunk,
+    )
+    logger.info("TTS (%s) synthesized %d characters in %.1fs", backend.voice_id, len(text), time.time() - started)
+    return audio
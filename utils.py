@@ -1,52 +1,444 @@
 import streamlit as st
 import requests, time
+import json
+import logging
+import os
+import random
+import threading
+import httpx
 from google import genai
+from google.genai import types
 from google.genai.errors import APIError
+from cache_manager import (ResponseCache, CachedGeminiClient, KeyValidationCache, ClientPool, ContextCacheManager,
+                           BoundedStore, DiskLRUStore)
+from rate_limiter import RateLimiter, RateLimitedGeminiClient, RateLimitExceeded, key_id
+import transcription_manager as tm
+import tts_manager
+import document_manager as dm
+from job_manager import ProcessPoolHolder, create_process_pool, default_worker_count
 
+logger = logging.getLogger("logeekmind")
+# Timings (time-to-first-token, TTS, transcription) and retries are logged at INFO; without a level and handler of
+# its own the logger would inherit the root logger's WARNING level and drop them.
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    logger.addHandler(_log_handler)
+    logger.setLevel(os.environ.get("LOGEEKMIND_LOG_LEVEL", "INFO"))
+
+INVALID_KEY_STATUS_CODES = {400, 401, 403}
+
+@st.cache_resource
+def get_key_validation_cache():
+    return KeyValidationCache()
 
 def is_gemini_key_valid(api_key: str) -> bool:
     if not api_key:
         return False
 
+    validation_cache = get_key_validation_cache()
+    cached_result = validation_cache.get(api_key)
+    if cached_result is not None:
+        if not cached_result:
+            st.error("Invalid API Key! Please check your key and try again")
+        return cached_result
+
     try:
         client = genai.Client(api_key=api_key)
         _ = client.models.get(model="gemini-2.5-flash")
 
+        validation_cache.put(api_key, True)
         return True
 
     except APIError as e:
-        st.error("Invalid API Key! Please check your key and try again") if "400" in str(e) else st.error(f"Validation error: {e}")
+        # Only a definitive rejection is remembered; quota or network hiccups are retried next time.
+        if e.code in INVALID_KEY_STATUS_CODES:
+            validation_cache.put(api_key, False)
+            st.error("Invalid API Key! Please check your key and try again")
+        else:
+            st.error(f"Validation error: {e}")
         return False
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
         return False
 
-def check_rate_limit():
-
-    MAX_REQUESTS = 5
-    TIME_WINDOW = 30
-    SESSION_HISTORY_KEY = 'gemini_request_history'
+@st.cache_resource
+def get_rate_limiter():
+    return RateLimiter(
+        capacity=int(st.secrets.get("GEMINI_RATE_LIMIT_BURST", 5)),
+        refill_per_second=float(st.secrets.get("GEMINI_RATE_LIMIT_PER_MINUTE", 10)) / 60,
+        db_path=st.secrets.get("GEMINI_RATE_LIMIT_PATH"),
+    )
 
-    if SESSION_HISTORY_KEY not in st.session_state:
-        st.session_state[SESSION_HISTORY_KEY] = []
+def get_rate_limit_max_wait():
+    return float(st.secrets.get("GEMINI_RATE_LIMIT_MAX_WAIT", 15))
 
-    current_time = time.time()
-    history = st.session_state[SESSION_HISTORY_KEY]
+def check_rate_limit(api_key):
+    # Requests against the shared key are metered where they are sent (see RateLimitedGeminiClient);
+    # this only turns guests away up front when the shared queue is already too long.
+    time_to_wait = get_rate_limiter().estimate_wait(key_id(api_key))
 
-    history = [t for t in history if t > current_time - TIME_WINDOW]
-
-    if len(history) >= MAX_REQUESTS:
-        time_to_wait = int(TIME_WINDOW - (current_time - history[0]))
-
-        st.error(f"**Rate Limit Hit!** Please wait {time_to_wait} seconds before making use of any AI feature, "
+    if time_to_wait > get_rate_limit_max_wait():
+        st.error(f"**Rate Limit Hit!** Please wait {int(time_to_wait) + 1} seconds before making use of any AI feature, "
                  f"or enter your own API key for unlimited access.")
-        st.session_state[SESSION_HISTORY_KEY] = history
         return False
 
-    history.append(current_time)
-    st.session_state[SESSION_HISTORY_KEY] = history
     return True
 
+def stream_text(response_stream, feature="Gemini"):
+    start_time = time.perf_counter()
+    first_token_time = None
+
+    for chunk in response_stream:
+        text = chunk.text
+        if not text:
+            continue
+        if first_token_time is None:
+            first_token_time = time.perf_counter() - start_time
+            logger.info("%s time-to-first-token: %.2fs", feature, first_token_time)
+        yield text
+
+    logger.info("%s stream completed in %.2fs", feature, time.perf_counter() - start_time)
+
+class GeminiUnavailable(Exception):
+    pass
+
+GEMINI_ERRORS = (APIError, GeminiUnavailable, RateLimitExceeded)
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 16.0
+
+DEFAULT_TIMEOUT_SECONDS = 60
+FEATURE_TIMEOUTS = {
+    "AI Teacher": 90,
+    "Homework Assistant": 120,
+    "Exam Simulator": 120,
+    "Quiz Generator": 60,
+    "Course Outline Generator": 90,
+    "Study Schedule Generator": 90,
+}
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            # Half-open: let a single request through to probe whether Gemini has recovered.
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        # The request never got an answer from Gemini (e.g. it was rate limited locally); let another probe through.
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                logger.warning("Gemini circuit breaker opened after %d consecutive failures", self._failures)
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(model):
+    # Plain module state rather than st.cache_resource: this is also reached from worker threads.
+    with _circuit_breakers_lock:
+        if model not in _circuit_breakers:
+            _circuit_breakers[model] = CircuitBreaker()
+        return _circuit_breakers[model]
+
+def _is_retryable(error):
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, httpx.TransportError)
+
+def _with_timeout(config, timeout_seconds):
+    http_options = types.HttpOptions(timeout=int(timeout_seconds * 1000))
+    if config is None:
+        return types.GenerateContentConfig(http_options=http_options)
+    return config.model_copy(update={"http_options": http_options})
+
+def _call_with_retries(feature, model, send):
+    breaker = get_circuit_breaker(model)
+    timeout_seconds = FEATURE_TIMEOUTS.get(feature, DEFAULT_TIMEOUT_SECONDS)
+    deadline = time.monotonic() + timeout_seconds
+
+    for attempt in range(MAX_ATTEMPTS):
+        if not breaker.allow_request():
+            raise GeminiUnavailable("Gemini is degraded right now; requests are paused for a few seconds.")
+
+        try:
+            result = send(max(1.0, deadline - time.monotonic()))
+        except Exception as e:
+            if not _is_retryable(e):
+                # An API error means Gemini answered; anything else (a local rate limit, a bug) never reached
+                # it and says nothing about its health, so it must not close an open circuit.
+                if isinstance(e, APIError):
+                    breaker.record_success()
+                else:
+                    breaker.release_trial()
+                raise
+            if isinstance(e, APIError) and e.code == 429:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+            delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+            if attempt == MAX_ATTEMPTS - 1 or time.monotonic() + delay >= deadline:
+                if isinstance(e, httpx.TimeoutException):
+                    raise GeminiUnavailable(f"{feature} timed out waiting for Gemini.") from e
+                if isinstance(e, httpx.TransportError):
+                    raise GeminiUnavailable(f"{feature} could not reach Gemini.") from e
+                raise
+            logger.info("%s: transient Gemini error (%s), retrying in %.1fs", feature, e, delay)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+def generate_content(client, feature, *, model, contents, config=None):
+    return _call_with_retries(
+        feature,
+        model,
+        lambda timeout: client.models.generate_content(
+            model=model, contents=contents, config=_with_timeout(config, timeout)
+        ),
+    )
+
+def generate_content_stream(client, feature, *, model, contents, config=None):
+    # The stream is opened lazily, so retries cover everything up to the first chunk;
+    # once text has been shown to the user a failure is surfaced instead of replayed.
+    def open_stream(timeout):
+        response_stream = client.models.generate_content_stream(
+            model=model, contents=contents, config=_with_timeout(config, timeout)
+        )
+        first_chunk = next(response_stream, None)
+        return first_chunk, response_stream
+
+    first_chunk, response_stream = _call_with_retries(feature, model, open_stream)
+    if first_chunk is not None:
+        yield first_chunk
+    yield from response_stream
+
+def handle_gemini_error(error):
+    if isinstance(error, RateLimitExceeded):
+        st.error(f"**Rate Limit Hit!** Please wait {int(error.wait_seconds) + 1} seconds before making use of any AI "
+                 f"feature, or enter your own API key for unlimited access.")
+        return
+
+    error_text = str(error)
+    if isinstance(error, APIError) and (error.code == 429 or "RESOURCE_EXHAUSTED" in error_text.upper()):
+        if "api_key" in st.session_state:
+            del st.session_state.api_key
+        st.error("🚨 **Quota Exceeded!** The Gemini API key has hit its limit")
+        st.stop()
+    elif isinstance(error, GeminiUnavailable) or (isinstance(error, APIError) and error.code == 503):
+        st.warning("The Gemini AI model is currently experiencing high traffic. Please try again later.")
+        st.info("Meanwhile, try other non-AI features like GPA Calculator, Study Scheduler, etc.")
+    else:
+        st.error(f"An API error occurred during generation: {error}")
+
+QUESTION_LIST_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "question": types.Schema(type=types.Type.STRING),
+            "options": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+            "answer": types.Schema(type=types.Type.STRING),
+            "explanation": types.Schema(type=types.Type.STRING),
+        },
+        required=["question", "options", "answer", "explanation"],
+        property_ordering=["question", "options", "answer", "explanation"],
+    ),
+)
+
+QUESTION_GENERATION_CONFIG = types.GenerateContentConfig(
+    response_mime_type="application/json",
+    response_schema=QUESTION_LIST_SCHEMA,
+)
+
+def _is_valid_question(item):
+    return (
+        isinstance(item, dict)
+        and isinstance(item.get("question"), str) and item["question"].strip()
+        and isinstance(item.get("options"), list) and len(item["options"]) >= 2
+        and all(isinstance(option, str) for option in item["options"])
+        and item.get("answer") in item["options"]
+        and isinstance(item.get("explanation"), str)
+    )
+
+def parse_questions(text):
+    # Decodes the question array one item at a time so a single malformed or truncated
+    # question costs only that question, not the whole quiz.
+    text = text.replace("```json", "").replace("```", "").strip()
+    start = text.find("[")
+    if start == -1:
+        raise ValueError("AI output is not a list of questions")
+
+    decoder = json.JSONDecoder()
+    questions = []
+    index = start + 1
+    while index < len(text):
+        while index < len(text) and text[index] in " \t\r\n,":
+            index += 1
+        if index >= len(text) or text[index] == "]":
+            break
+        try:
+            item, index = decoder.raw_decode(text, index)
+        except json.JSONDecodeError:
+            # Skip the malformed question and resume at the next object; a truncated tail has none.
+            index = text.find("{", index + 1)
+            if index == -1:
+                break
+            continue
+        if _is_valid_question(item):
+            questions.append(item)
+
+    if not questions:
+        raise ValueError("AI output contained no valid questions")
+    return questions
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(
+        max_entries=int(st.secrets.get("GEMINI_CACHE_MAX_ENTRIES", 512)),
+        ttl_seconds=int(st.secrets.get("GEMINI_CACHE_TTL_SECONDS", 6 * 60 * 60)),
+        disk_path=st.secrets.get("GEMINI_CACHE_PATH"),
+    )
+
+@st.cache_resource
+def get_transcript_cache():
+    return BoundedStore(int(st.secrets.get("TRANSCRIPT_CACHE_MAX_MB", 64)) * 1024 * 1024, sizeof=tm.transcript_size)
+
+def asr_engine():
+    return st.secrets.get("ASR_ENGINE", "whisper")
+
+def asr_model_size():
+    return st.secrets.get("ASR_MODEL_SIZE", "base")
+
+def worker_count(secret_name):
+    # Process pool size for a feature, overridable per feature in secrets.
+    workers = st.secrets.get(secret_name)
+    return int(workers) if workers else default_worker_count()
+
+@st.cache_resource
+def get_transcription_pool():
+    return ProcessPoolHolder(lambda: tm.create_transcription_pool(asr_engine(), asr_model_size(),
+                                                                  worker_count("TRANSCRIPTION_WORKERS")))
+
+@st.cache_resource
+def start_transcription_prewarm():
+    # Called from the home page and the audio page; whichever a fresh server serves first starts it, once.
+    if not st.secrets.get("ASR_PREWARM", True):
+        return None
+    return tm.PoolPrewarm(get_transcription_pool(), worker_count("TRANSCRIPTION_WORKERS"))
+
+@st.cache_resource
+def get_tts_pool():
+    # Shared by every TTS job in the process, so the number of concurrent requests to the TTS service stays bounded.
+    return tts_manager.create_tts_pool(int(st.secrets.get("TTS_WORKERS", 4)))
+
+@st.cache_resource
+def get_tts_cache():
+    return DiskLRUStore(st.secrets.get("TTS_CACHE_DIR", os.path.join(".cache", "tts")),
+                        int(st.secrets.get("TTS_CACHE_MAX_MB", 256)) * 1024 * 1024)
+
+@st.cache_resource
+def get_tts_backend():
+    return tts_manager.load_backend(st.secrets.get("TTS_BACKEND", "gtts"), st.secrets.get("TTS_LANG", "en"))
+
+@st.cache_resource
+def get_document_pool():
+    return ProcessPoolHolder(lambda: create_process_pool(worker_count("DOCUMENT_WORKERS")))
+
+@st.cache_resource
+def get_document_cache():
+    return BoundedStore(int(st.secrets.get("DOCUMENT_CACHE_MAX_MB", 128)) * 1024 * 1024, sizeof=dm.document_size)
+
+def document_preview_pages():
+    return int(st.secrets.get("DOCUMENT_PREVIEW_PAGES", 50))
+
+def document_max_chars():
+    return int(st.secrets.get("DOCUMENT_MAX_CHARS", 1_000_000))
+
+def describe_uploaded_document(uploaded_file):
+    # Streamlit reruns the whole page on every click, so the same upload arrives here again and again.
+    # Its content hash and page count are remembered per upload (file_id) so neither is recomputed.
+    known = st.session_state.setdefault("document_keys", {})
+    info = known.get(uploaded_file.file_id)
+    if info is None:
+        data = uploaded_file.getvalue()
+        info = known[uploaded_file.file_id] = {
+            "key": dm.content_key(data, uploaded_file.name),
+            "page_count": dm.count_pages(data, uploaded_file.name),
+        }
+    return info
+
+def choose_page_range(uploaded_file, key):
+    # Only the chosen pages are ever read; by default that is the first document_preview_pages().
+    page_count = describe_uploaded_document(uploaded_file)["page_count"]
+    if page_count <= 1:
+        return None
+    first, last = st.slider(
+        f"Pages to use (this document has {page_count})",
+        min_value=1, max_value=page_count, value=(1, min(page_count, document_preview_pages())), key=key,
+    )
+    return first - 1, last
+
+def extract_uploaded_document(uploaded_file, page_range=None):
+    # Extractions are shared across sessions; the same file, pages and cap always give the same text.
+    info = describe_uploaded_document(uploaded_file)
+    max_chars = document_max_chars()
+    key = f"{info['key']}:{page_range}:{max_chars}"
+
+    cache = get_document_cache()
+    document = cache.get(key)
+    if document is None:
+        document = get_document_pool().run(lambda pool: dm.extract_document(
+            uploaded_file.getvalue(), uploaded_file.name, pool, worker_count("DOCUMENT_WORKERS"), page_range,
+            max_chars,
+        ))
+        cache.put(key, document)
+    return {**document, "metadata": {**document["metadata"], "name": uploaded_file.name}}
+
+@st.cache_resource
+def get_summarizer_pool():
+    return ProcessPoolHolder(lambda: create_process_pool(worker_count("SUMMARIZER_WORKERS")))
+
+@st.cache_resource
+def get_context_cache_manager():
+    return ContextCacheManager(ttl_seconds=int(st.secrets.get("GEMINI_CONTEXT_CACHE_TTL_SECONDS", 60 * 60)))
+
+@st.cache_resource
+def get_client_pool():
+    return ClientPool(lambda api_key: genai.Client(api_key=api_key),
+                      max_clients=int(st.secrets.get("GEMINI_CLIENT_POOL_SIZE", 64)))
+
 def get_gemini_client():
     gemini_api_key = None
 
@@ -70,23 +462,23 @@ def get_gemini_client():
             if user_key:
                 if is_gemini_key_valid(user_key):
                     st.session_state.api_key = user_key
-                    st.success("API Key accepted and validated!")
-                    time.sleep(1)
+                    st.toast("API Key accepted and validated!", icon="✅")
                     st.rerun()
                 else:
                     #st.error("Invalid API Key!. Please check your key and try again.")
                     pass
 
-            elif not user_key and not check_rate_limit():
+            elif not user_key and gemini_api_key and not check_rate_limit(gemini_api_key):
                 return None
 
 
     try:
-        @st.cache_resource
-        def initialize_client():
-            return genai.Client(api_key=gemini_api_key)
+        client_key_id = key_id(gemini_api_key)
+        client = get_client_pool().get(client_key_id, gemini_api_key)
+        if not st.session_state.get('api_key'):
+            client = RateLimitedGeminiClient(client, get_rate_limiter(), gemini_api_key, get_rate_limit_max_wait())
 
-        return initialize_client()
+        return CachedGeminiClient(client, get_response_cache(), client_key_id)
     except APIError as e:
         error_text = str(e)
         if "rate limit" in error_text.lower():